@@ -0,0 +1,14 @@
+"""
+gunicorn settings, loaded automatically when gunicorn is started from the
+project directory. Everything else is configured on the command line.
+"""
+import os
+
+
+def post_fork(server, worker):
+    # Lets skus.warmup tell workers from the master (see GUNICORN_WORKER_ENV).
+    os.environ['SKU_GUNICORN_WORKER_PID'] = str(os.getpid())
+    if server.cfg.preload_app:
+        from skus.warmup import warm_up_forked_worker
+
+        warm_up_forked_worker()
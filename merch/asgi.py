@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+import time
+
+boot_started = time.perf_counter()
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'merch.settings')
 
 application = get_asgi_application()
+
+# Optional warm-up, see skus/warmup.py
+from skus.warmup import warm_up_on_boot
+
+warm_up_on_boot(boot_started)
+
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'skus.query_budget.QueryBudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'merch.urls'
@@ -98,11 +100,39 @@ else:
         'default': dj_database_url.config(
             # Replace this value with your local database's connection string.
             default=os.environ.get('DATABASE_URL'),
-            conn_max_age=600
+            conn_max_age=600,
+            conn_health_checks=True,
         )
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+# Cached payloads, facets, leaderboards and their version keys must be shared by
+# every process (web workers, admin, `run_jobs`), or a change only invalidates the
+# cache of the process that made it. The file-based cache is shared by all processes
+# on one host; set REDIS_URL when the web service and job workers run on separate hosts.
+REDIS_URL = os.environ.get("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'var' / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+    if sys.argv[1:2] == ['test']:
+        # Test runs neither read nor wipe the development server's cache
+        CACHES['default']['LOCATION'] = BASE_DIR / 'var' / 'test_cache'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -161,6 +191,52 @@ LOGOUT_URL = 'logout'
 HIGH_RETURN_RATE = 5.0
 LOW_CONTENT_SCORE = 6.0
 
+# Seconds to cache unfiltered catalog facet histograms (invalidated on SKU changes)
+SKU_FACETS_CACHE_TIMEOUT = 300
+
+# Seconds to cache SKU detail payloads and the first dashboard page (invalidated on changes)
+SKU_PAGE_CACHE_TIMEOUT = 60
+# Seconds to cache the mapping of a SKU ID to its primary key (re-resolved when it goes stale)
+SKU_PK_CACHE_TIMEOUT = 3600
+# Seconds an expired payload may still be served while one request refreshes it
+SKU_SINGLEFLIGHT_STALE_TIMEOUT = 10
+# Also coalesce across the workers of a host through lock files
+SKU_SINGLEFLIGHT_SHARED = os.environ.get("SKU_SINGLEFLIGHT_SHARED", "True") == "True"
+SKU_SINGLEFLIGHT_LOCK_DIR = BASE_DIR / 'var' / 'singleflight'
+SKU_SINGLEFLIGHT_LOCK_TIMEOUT = 5 # Seconds to wait for another worker before computing anyway
+
+# Serve SKU list queries from a memory-mapped columnar snapshot (requires NumPy)
+SKU_SNAPSHOT_ENABLED = os.environ.get("SKU_SNAPSHOT_ENABLED", "False") == "True"
+SKU_SNAPSHOT_DIR = BASE_DIR / 'var' / 'catalog_snapshot'
+# Queue a build_catalog_snapshot job (run by `manage.py run_jobs`) when a request finds the snapshot stale
+SKU_SNAPSHOT_AUTO_REBUILD = True
+
+# Leaderboards: entries returned at most (K) and seconds before a board is rebuilt from the database
+SKU_LEADERBOARD_SIZE = 100
+SKU_LEADERBOARD_TIMEOUT = 3600
+# Lock files serializing board updates across the processes of a host
+SKU_LEADERBOARD_LOCK_DIR = BASE_DIR / 'var' / 'leaderboards'
+
+# Warm up URL resolvers, serializers, DB connections and caches when a worker boots
+SKU_WARM_UP_ON_BOOT = os.environ.get("SKU_WARM_UP_ON_BOOT", "False") == "True"
+
+# Query budgets: 'off', 'log' or 'raise' when a view exceeds its `query_budget`
+# or repeats the same query QUERY_BUDGET_REPEAT_THRESHOLD times (N+1)
+QUERY_BUDGET_MODE = os.environ.get("QUERY_BUDGET_MODE", "log" if DEBUG else "off")
+QUERY_BUDGET_REPEAT_THRESHOLD = 5
+QUERY_BUDGET_DEFAULT = None # Budget for views without a `query_budget`, None only checks for N+1
+
+# Admin changelists tuned for very large SKU, note and metric tables
+SKU_ADMIN_LARGE_TABLES = os.environ.get("SKU_ADMIN_LARGE_TABLES", "False") == "True"
+# Above this planner estimate, admin changelists show estimated counts (PostgreSQL only)
+SKU_ADMIN_EXACT_COUNT_THRESHOLD = 10000
+
+# Background jobs (`manage.py run_jobs`)
+SKU_JOBS_WORKERS = int(os.environ.get("SKU_JOBS_WORKERS", "2"))
+SKU_JOBS_RETRY_DELAY = 10 # Seconds before the first retry, doubled on every further attempt
+SKU_JOBS_HEARTBEAT_INTERVAL = 30 # Seconds between heartbeats of a worker's running jobs
+SKU_JOBS_STALE_TIMEOUT = 300 # Running jobs without a heartbeat for this long are requeued (or failed once out of attempts)
+
 STATIC_URL = '/static/'
 
 # This production code might break development mode, so we check whether we're in DEBUG mode
@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+import time
+
+boot_started = time.perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'merch.settings')
 
 application = get_wsgi_application()
+
+# Optional warm-up, see skus/warmup.py
+from skus.warmup import warm_up_on_boot
+
+warm_up_on_boot(boot_started)
+
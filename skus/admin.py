@@ -1,27 +1,191 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 # Register your models here.
-from .models import SKU, Note, SKUDailyMetric
+from .facets import bucket_ranges, get_facet_buckets
+from .models import SKU, Note, SKUDailyMetric, Job
+from .search import search_notes
+
+
+class BucketRangeListFilter(admin.SimpleListFilter):
+    """
+    List filter offering a fixed set of value ranges (the facet buckets)
+    instead of one option per distinct value.
+    """
+    field_name = None
+
+    def ranges(self):
+        """
+        Maps each URL value to its (lower, upper) bounds.
+        """
+        return {
+            f"{'' if lower is None else lower}:{'' if upper is None else upper}": (lower, upper)
+            for lower, upper in bucket_ranges(get_facet_buckets()[self.field_name])
+        }
+
+    def lookups(self, request, model_admin):
+        choices = []
+        for value, (lower, upper) in self.ranges().items():
+            if lower is None:
+                label = f"< {upper}"
+            elif upper is None:
+                label = f">= {lower}"
+            else:
+                label = f"{lower} - {upper}"
+            choices.append((value, label))
+        return choices
+
+    def queryset(self, request, queryset):
+        # Only the offered ranges are accepted, anything else is ignored.
+        if self.value() not in self.ranges():
+            return queryset
+        lower, upper = self.ranges()[self.value()]
+        if lower is not None:
+            queryset = queryset.filter(**{f'{self.field_name}__gte': lower})
+        if upper is not None:
+            queryset = queryset.filter(**{f'{self.field_name}__lt': upper})
+        return queryset
+
+
+class ReturnPercentageRangeFilter(BucketRangeListFilter):
+    title = 'returns percentage'
+    parameter_name = 'return_percentage_range'
+    field_name = 'return_percentage'
+
+
+class ContentScoreRangeFilter(BucketRangeListFilter):
+    title = 'content score'
+    parameter_name = 'content_score_range'
+    field_name = 'content_score'
+
+
+class SalesRangeFilter(BucketRangeListFilter):
+    title = 'total sales'
+    parameter_name = 'sales_range'
+    field_name = 'sales'
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that uses the query planner's row estimate on PostgreSQL
+    when it is above `SKU_ADMIN_EXACT_COUNT_THRESHOLD`, avoiding an exact
+    COUNT(*) over very large tables.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+                plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            estimate = int(plan[0]['Plan']['Plan Rows'])
+            if estimate > getattr(settings, "SKU_ADMIN_EXACT_COUNT_THRESHOLD", 10000):
+                return estimate
+        return super().count
 
 
-class SKUAdmin(admin.ModelAdmin):
+class LargeTableAdminMixin:
+    """
+    Switches a ModelAdmin to settings that stay fast on very large tables
+    when `SKU_ADMIN_LARGE_TABLES` is enabled: bucketed or indexed filters,
+    index-backed search lookups, estimated counts and no full result count.
+    """
+    large_list_filter = ()
+    large_search_fields = ()
+    large_ordering = None
+
+    def is_large_table_mode(self):
+        return getattr(settings, "SKU_ADMIN_LARGE_TABLES", False)
+
+    @property
+    def show_full_result_count(self):
+        return not self.is_large_table_mode()
+
+    def get_list_filter(self, request):
+        if self.is_large_table_mode():
+            return self.large_list_filter
+        return super().get_list_filter(request)
+
+    def get_search_fields(self, request):
+        if self.is_large_table_mode():
+            return self.large_search_fields
+        return super().get_search_fields(request)
+
+    def get_ordering(self, request):
+        if self.is_large_table_mode() and self.large_ordering:
+            return self.large_ordering
+        return super().get_ordering(request)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        if self.is_large_table_mode():
+            return EstimatedCountPaginator(queryset, per_page, orphans, allow_empty_first_page)
+        return super().get_paginator(request, queryset, per_page, orphans, allow_empty_first_page)
+
+
+class SKUAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('sku_id', 'name', 'sales', 'return_percentage', 'content_score')
     search_fields = ('sku_id', 'name')
     list_filter = ('return_percentage',)
     ordering = ('name',)
 
+    large_list_filter = (ReturnPercentageRangeFilter, ContentScoreRangeFilter, SalesRangeFilter)
+    large_search_fields = ('sku_id__startswith', 'name__startswith')
+
 
-class NoteAdmin(admin.ModelAdmin):
+class NoteAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('sku', 'created_at', 'created_by')
     search_fields = ('sku__name', 'text')
     list_filter = ('created_at', 'created_by')
+    list_select_related = ('sku', 'created_by')
+    autocomplete_fields = ('sku',)
+    raw_id_fields = ('created_by',)
+
+    large_list_filter = ('created_at',)
+    large_search_fields = ('sku__sku_id__exact',)
+    large_ordering = ('-created_at', '-id')
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        In large-table mode, note text is searched through the full-text
+        index instead of a LIKE scan.
+        """
+        if not (self.is_large_table_mode() and search_term):
+            return super().get_search_results(request, queryset, search_term)
+        matches = search_notes(Note.objects.all(), search_term).values('id')
+        return queryset.filter(Q(id__in=matches) | Q(sku__sku_id=search_term)), False
 
-class SKUDailyMetricAdmin(admin.ModelAdmin):
+class SKUDailyMetricAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('sku', 'date', 'sales_units', 'returns_units')
     search_fields = ('sku__name',)
     list_filter = ('date',)
+    list_select_related = ('sku',)
+    autocomplete_fields = ('sku',)
+
+    large_list_filter = ('date',)
+    large_search_fields = ('sku__sku_id__exact',)
+    large_ordering = ('-date', '-id')
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'progress', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    list_select_related = ('created_by',)
+    raw_id_fields = ('created_by',)
+    ordering = ('-created_at',)
 
 
 admin.site.register(SKU, SKUAdmin)
 admin.site.register(Note, NoteAdmin)
 admin.site.register(SKUDailyMetric, SKUDailyMetricAdmin)
+admin.site.register(Job, JobAdmin)
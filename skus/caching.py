@@ -0,0 +1,40 @@
+import uuid
+
+from django.core.cache import cache
+
+
+def _new_version():
+    # A unique value rather than a counter: if the version key is evicted,
+    # a restarted counter could match entries cached under an old version.
+    return uuid.uuid4().hex
+
+
+def get_version(namespace):
+    """
+    Returns the current cache version for a namespace.
+    Versions are bumped whenever the underlying data changes, which
+    invalidates every key built for the previous version at once.
+    """
+    key = f"skus:version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, timeout=None):
+            # Another process seeded the namespace first, use its version.
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidates all cached entries of a namespace.
+    """
+    cache.set(f"skus:version:{namespace}", _new_version(), timeout=None)
+
+
+def versioned_key(namespace, *parts):
+    """
+    Builds a cache key tied to the current version of the namespace.
+    """
+    suffix = ":".join(str(part) for part in parts)
+    return f"skus:{namespace}:v{get_version(namespace)}:{suffix}"
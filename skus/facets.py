@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .caching import versioned_key
+from .models import SKU
+
+FACET_FIELDS = ('return_percentage', 'content_score', 'sales')
+
+# Bucket edges per attribute. Values below the first edge and at or above the
+# last edge are reported in open-ended buckets.
+DEFAULT_FACET_BUCKETS = {
+    'return_percentage': [0, 2, 5, 10, 15, 20, 30],
+    'content_score': [0, 2, 4, 6, 8, 10],
+    'sales': [0, 100, 250, 500, 1000, 1500, 2500],
+}
+
+
+def get_facet_buckets():
+    buckets = dict(DEFAULT_FACET_BUCKETS)
+    buckets.update(getattr(settings, "SKU_FACET_BUCKETS", {}))
+    return buckets
+
+
+def bucket_ranges(edges):
+    """
+    Turns sorted bucket edges into (lower, upper) pairs where the lower
+    bound is inclusive and the upper bound exclusive. ``None`` marks an
+    open end.
+    """
+    bounds = [None] + list(edges) + [None]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def compute_facets(queryset, fields):
+    """
+    Computes histograms for all requested fields with a single aggregate
+    query (one conditional COUNT per bucket), so the table is scanned once
+    regardless of how many facets are requested.
+    """
+    buckets = get_facet_buckets()
+    aggregates = {'total': Count('id')}
+    ranges = {}
+    for field in fields:
+        ranges[field] = bucket_ranges(buckets[field])
+        for index, (lower, upper) in enumerate(ranges[field]):
+            condition = Q()
+            if lower is not None:
+                condition &= Q(**{f'{field}__gte': lower})
+            if upper is not None:
+                condition &= Q(**{f'{field}__lt': upper})
+            aggregates[f'{field}__{index}'] = Count('id', filter=condition)
+
+    counts = queryset.order_by().aggregate(**aggregates)
+
+    result = {'total': counts['total'], 'facets': {}}
+    for field in fields:
+        result['facets'][field] = [
+            {'min': lower, 'max': upper, 'count': counts[f'{field}__{index}']}
+            for index, (lower, upper) in enumerate(ranges[field])
+        ]
+    return result
+
+
+def catalog_facets(fields=FACET_FIELDS):
+    """
+    Returns the histograms over the whole catalog, cached until a SKU changes.
+    """
+    cache_key = versioned_key('catalog', 'facets', ','.join(fields))
+    data = cache.get(cache_key)
+    if data is None:
+        data = compute_facets(SKU.objects.all(), fields)
+        cache.set(cache_key, data, getattr(settings, 'SKU_FACETS_CACHE_TIMEOUT', 300))
+    return data
@@ -0,0 +1,214 @@
+"""
+Lightweight background jobs backed by the `Job` table.
+
+Functions are registered with `@register` and queued with `submit()`.
+`manage.py run_jobs` claims queued jobs by priority and runs them in a
+thread or process pool. Each job function receives a `JobContext` as its
+first argument for progress reporting, followed by the job's params as
+keyword arguments. Failed jobs are retried with exponential back-off
+until `max_attempts` is reached.
+
+While a job runs, its worker touches `heartbeat_at` every
+`SKU_JOBS_HEARTBEAT_INTERVAL` seconds, as does every progress report.
+Running jobs whose heartbeat is older than `SKU_JOBS_STALE_TIMEOUT` belong
+to a dead worker and are requeued, or failed once out of attempts. Jobs registered with `staff_only` can
+only be submitted through the API by staff users.
+"""
+import datetime
+import logging
+import traceback
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+RegisteredJob = namedtuple('RegisteredJob', ['func', 'max_attempts', 'staff_only'])
+
+_registry = {}
+
+
+def register(name=None, max_attempts=3, staff_only=False):
+    """
+    Decorator registering a function as a job under `name`
+    (defaults to the function name).
+    """
+    def decorator(func):
+        _registry[name or func.__name__] = RegisteredJob(func, max_attempts, staff_only)
+        return func
+    return decorator
+
+
+def registered_jobs():
+    return sorted(_registry)
+
+
+def get_registered(name):
+    """
+    Returns the `RegisteredJob` for `name`, or None if there is none.
+    """
+    return _registry.get(name)
+
+
+def submit(name, params=None, priority=0, user=None, max_attempts=None):
+    """
+    Queues a registered job and returns the created `Job`.
+    """
+    if name not in _registry:
+        raise ValueError(f"Unknown job: {name}")
+    return Job.objects.create(
+        name=name,
+        params=params or {},
+        priority=priority,
+        max_attempts=max_attempts or _registry[name].max_attempts,
+        created_by=user,
+    )
+
+
+class JobContext:
+    """
+    Handle passed to running jobs.
+    """
+
+    def __init__(self, job):
+        self.job = job
+
+    def progress(self, fraction, message=''):
+        """
+        Records progress as a fraction between 0 and 1.
+        """
+        fraction = max(0.0, min(1.0, fraction))
+        Job.objects.filter(pk=self.job.pk).update(
+            progress=fraction, progress_message=message[:255], heartbeat_at=timezone.now()
+        )
+
+
+def claim_next(worker_id):
+    """
+    Atomically marks the highest priority runnable job as running and
+    returns its id, or None if the queue is empty. The conditional UPDATE
+    makes concurrent workers race safely without row locks, so this works
+    on SQLite as well as PostgreSQL.
+    """
+    candidates = Job.objects.filter(
+        status=Job.STATUS_QUEUED, run_after__lte=timezone.now()
+    ).order_by('-priority', 'run_after', 'id').values_list('id', flat=True)[:10]
+
+    for job_id in candidates:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=job_id, status=Job.STATUS_QUEUED).update(
+            status=Job.STATUS_RUNNING,
+            locked_by=worker_id,
+            started_at=now,
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def unclaim(job_id):
+    """
+    Returns a claimed job that never started to the queue, without
+    counting the claim as an attempt.
+    """
+    return Job.objects.filter(pk=job_id, status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_QUEUED,
+        locked_by='',
+        started_at=None,
+        heartbeat_at=None,
+        attempts=F('attempts') - 1,
+    )
+
+
+def heartbeat(job_ids):
+    """
+    Marks the given running jobs as alive.
+    """
+    return Job.objects.filter(pk__in=job_ids, status=Job.STATUS_RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """
+    Puts running jobs whose worker stopped sending heartbeats back on the
+    queue, or fails them once they are out of attempts. Returns the number
+    of requeued and failed jobs.
+    """
+    timeout = getattr(settings, "SKU_JOBS_STALE_TIMEOUT", 300)
+    now = timezone.now()
+    cutoff = now - datetime.timedelta(seconds=timeout)
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status=Job.STATUS_RUNNING,
+    )
+    error = f"Worker stopped sending heartbeats for more than {timeout} seconds."
+
+    requeued = stale.filter(attempts__lt=F('max_attempts')).update(
+        status=Job.STATUS_QUEUED, locked_by='', error=error
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.STATUS_FAILED, locked_by='', error=error, finished_at=now
+    )
+    return requeued, failed
+
+
+def run_job(job_id):
+    """
+    Executes a claimed job and records its outcome.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        registered = _registry.get(job.name)
+        if registered is None:
+            _finish(job, Job.STATUS_FAILED, error=f"Unknown job: {job.name}")
+            return
+
+        try:
+            result = registered.func(JobContext(job), **job.params)
+        except Exception:
+            error = traceback.format_exc()
+            logger.exception("Job %s failed (attempt %s/%s)", job.pk, job.attempts, job.max_attempts)
+            if job.attempts < job.max_attempts:
+                delay = getattr(settings, "SKU_JOBS_RETRY_DELAY", 10) * 2 ** (job.attempts - 1)
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.STATUS_QUEUED,
+                    locked_by='',
+                    error=error,
+                    run_after=timezone.now() + datetime.timedelta(seconds=delay),
+                )
+            else:
+                _finish(job, Job.STATUS_FAILED, error=error)
+        else:
+            _finish(job, Job.STATUS_SUCCEEDED, result=result)
+    finally:
+        close_old_connections()
+
+
+def _finish(job, status, result=None, error=''):
+    updates = {'status': status, 'finished_at': timezone.now(), 'locked_by': '', 'result': result}
+    if status == Job.STATUS_SUCCEEDED:
+        updates['progress'] = 1.0
+    if error:
+        updates['error'] = error
+    Job.objects.filter(pk=job.pk).update(**updates)
+
+
+def release_crashed_job(job_id, error):
+    """
+    Requeues (or fails, once out of attempts) a job whose executor died
+    before it could record an outcome.
+    """
+    job = Job.objects.get(pk=job_id)
+    if job.status != Job.STATUS_RUNNING:
+        return
+    if job.attempts < job.max_attempts:
+        Job.objects.filter(pk=job.pk).update(status=Job.STATUS_QUEUED, locked_by='', error=error)
+    else:
+        _finish(job, Job.STATUS_FAILED, error=error)
@@ -0,0 +1,216 @@
+"""
+Incrementally maintained top-K SKU leaderboards.
+
+Each board is a short, ranked list kept in the cache. It holds up to
+`SKU_LEADERBOARD_SIZE` entries plus a buffer of the same size, so reads
+are O(K) regardless of catalog size. Boards are built lazily with one
+index-backed `ORDER BY ... LIMIT` query and afterwards updated from the
+SKU and daily metric signals: a changed SKU is re-ranked within the list,
+and the board is only rebuilt when removals shrink it below K.
+
+Rolling-window boards rank SKUs by the sum of a daily metric over the
+last N days (today included). Their key contains the current date, so
+they are rebuilt once per day when the window moves.
+
+Boards live in the shared cache, so saves from any process (web workers,
+the admin, `run_jobs`) reach them. Updates are read-modify-write
+operations serialized per board with a lock file, which covers every
+process on a host. With several hosts sharing a Redis cache an update can
+still be lost; boards expire after `SKU_LEADERBOARD_TIMEOUT` seconds,
+which bounds its effect.
+"""
+import bisect
+import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .caching import versioned_key
+from .locks import file_lock
+from .models import SKU, SKUDailyMetric
+from .singleflight import SingleFlight
+
+BOARDS = {
+    'sales': {'field': 'sales', 'descending': True},
+    'return_percentage': {'field': 'return_percentage', 'descending': True},
+    'content_score': {'field': 'content_score', 'descending': False},
+    'sales_7d': {'metric': 'sales_units', 'days': 7, 'descending': True},
+    'sales_30d': {'metric': 'sales_units', 'days': 30, 'descending': True},
+    'returns_7d': {'metric': 'returns_units', 'days': 7, 'descending': True},
+    'returns_30d': {'metric': 'returns_units', 'days': 30, 'descending': True},
+}
+
+ROW_FIELDS = ('sku_id', 'name', 'sales', 'return_percentage', 'content_score')
+
+_rebuilds = SingleFlight()
+
+
+def get_size():
+    return getattr(settings, "SKU_LEADERBOARD_SIZE", 100)
+
+
+def _capacity():
+    # Keep a buffer beyond K so SKUs dropping out rarely force a rebuild.
+    return get_size() * 2
+
+
+def _cache_key(board):
+    parts = [board]
+    if 'days' in BOARDS[board]:
+        parts.append(datetime.date.today().isoformat())
+    return versioned_key('leaderboards', *parts)
+
+
+def _board_lock(board):
+    lock_dir = Path(getattr(settings, "SKU_LEADERBOARD_LOCK_DIR", settings.BASE_DIR / 'var' / 'leaderboards'))
+    return file_lock(lock_dir / f'{board}.lock')
+
+
+def _window_start(days):
+    return datetime.date.today() - datetime.timedelta(days=days - 1)
+
+
+def _sort_key(board, score, pk):
+    """
+    Ascending sort key placing the best entry first.
+    """
+    return (-score if BOARDS[board]['descending'] else score, pk)
+
+
+def _row(sku, score):
+    row = {field: getattr(sku, field) for field in ROW_FIELDS}
+    row['score'] = score
+    return row
+
+
+def _store(board, entries, complete):
+    cache.set(
+        _cache_key(board),
+        {'entries': entries, 'complete': complete},
+        getattr(settings, "SKU_LEADERBOARD_TIMEOUT", 3600),
+    )
+
+
+def rebuild(board):
+    """
+    Builds a board from the database.
+    """
+    with _board_lock(board):
+        return _rebuild(board)
+
+
+def _rebuild(board):
+    config = BOARDS[board]
+    capacity = _capacity()
+
+    if 'field' in config:
+        ordering = f"-{config['field']}" if config['descending'] else config['field']
+        skus = list(SKU.objects.order_by(ordering, 'pk')[:capacity + 1])
+        scored = [(sku, getattr(sku, config['field'])) for sku in skus]
+    else:
+        ordering = '-total' if config['descending'] else 'total'
+        totals = list(
+            SKUDailyMetric.objects.filter(date__gte=_window_start(config['days']), date__lte=datetime.date.today())
+            .order_by()
+            .values('sku_id')
+            .annotate(total=Sum(config['metric']))
+            .order_by(ordering, 'sku_id')[:capacity + 1]
+        )
+        skus = SKU.objects.in_bulk([total['sku_id'] for total in totals])
+        scored = [(skus[total['sku_id']], total['total']) for total in totals if total['sku_id'] in skus]
+
+    complete = len(scored) <= capacity
+    entries = [
+        [_sort_key(board, score, sku.pk), sku.pk, _row(sku, score)]
+        for sku, score in scored[:capacity]
+    ]
+    _store(board, entries, complete)
+    return {'entries': entries, 'complete': complete}
+
+
+def top(board, limit=None):
+    """
+    Returns the best `limit` (at most K) rows of a board.
+    """
+    size = get_size()
+    limit = size if limit is None else min(limit, size)
+    data = cache.get(_cache_key(board))
+    if data is None:
+        data = _rebuilds.do(board, lambda: rebuild(board))
+    return [entry[2] for entry in data['entries'][:limit]]
+
+
+def _update(board, pk, row=None, score=None):
+    """
+    Re-ranks (or, without a row, removes) one SKU on a cached board.
+    """
+    with _board_lock(board):
+        _update_locked(board, pk, row, score)
+
+
+def _update_locked(board, pk, row, score):
+    key = _cache_key(board)
+    data = cache.get(key)
+    if data is None:
+        # Not built yet, the next read builds it from the database.
+        return
+
+    entries = [entry for entry in data['entries'] if entry[1] != pk]
+
+    if row is not None:
+        # A partial board holds exactly the best SKUs of the catalog, so
+        # only SKUs ranking above its last entry are known to belong on it.
+        sort_key = _sort_key(board, score, pk)
+        if data['complete'] or (entries and sort_key < tuple(entries[-1][0])):
+            bisect.insort(entries, [sort_key, pk, row], key=lambda item: tuple(item[0]))
+            if len(entries) > _capacity():
+                entries.pop()
+                data['complete'] = False
+
+    if len(entries) < get_size() and not data['complete']:
+        cache.delete(key)
+        return
+    _store(board, entries, data['complete'])
+
+
+def update_sku(sku):
+    """
+    Re-ranks a saved SKU on every board it can appear on.
+    """
+    for board, config in BOARDS.items():
+        if 'field' in config:
+            score = getattr(sku, config['field'])
+            _update(board, sku.pk, _row(sku, score), score)
+        else:
+            data = cache.get(_cache_key(board))
+            if data is None:
+                continue
+            for entry in data['entries']:
+                if entry[1] == sku.pk:
+                    _update(board, sku.pk, _row(sku, entry[2]['score']), entry[2]['score'])
+                    break
+
+
+def update_window(sku):
+    """
+    Recomputes a SKU's rolling-window totals after its daily metrics changed.
+    """
+    for board, config in BOARDS.items():
+        if 'days' not in config:
+            continue
+        if cache.get(_cache_key(board)) is None:
+            continue
+        score = sku.daily_metrics.filter(
+            date__gte=_window_start(config['days']), date__lte=datetime.date.today()
+        ).aggregate(total=Sum(config['metric']))['total']
+        if score is None:
+            _update(board, sku.pk)
+        else:
+            _update(board, sku.pk, _row(sku, score), score)
+
+
+def remove_sku(pk):
+    for board in BOARDS:
+        _update(board, pk)
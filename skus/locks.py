@@ -0,0 +1,24 @@
+"""
+Advisory file locks, shared by every process on a host.
+"""
+import fcntl
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    Holds an exclusive lock on the file at `path`, yielding whether it was
+    acquired. The lock is released when the block exits or the process dies.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
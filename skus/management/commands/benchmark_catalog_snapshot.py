@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from skus import snapshot
+from skus.models import SKU
+
+
+class Command(BaseCommand):
+    """
+    Django management command comparing the SQL path of the SKU list with the
+    columnar snapshot for a set of typical dashboard queries.
+    """
+    help = 'Benchmarks SKU list queries against the database and the columnar snapshot.'
+
+    scenarios = [
+        ('default', {}),
+        ('search', {'search_terms': ['pro']}),
+        ('high_return_rate', {'filter_type': 'high_return_rate'}),
+        ('low_content_score -sales', {'filter_type': 'low_content_score', 'ordering': '-sales'}),
+        ('search -return_percentage,name', {'search_terms': ['a'], 'ordering': '-return_percentage,name'}),
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help='Number of runs per scenario.')
+        parser.add_argument('--page-size', type=int, default=10, help='Rows fetched per query.')
+
+    def handle(self, *args, **options):
+        if snapshot.np is None:
+            raise CommandError('NumPy is not installed, the catalog snapshot is unavailable.')
+
+        snapshot.build_snapshot()
+        catalog = snapshot.load_current()
+        iterations = options['iterations']
+        page_size = options['page_size']
+
+        self.stdout.write(f'{len(catalog)} SKUs, {iterations} iterations per scenario')
+        self.stdout.write(f"{'scenario':<34}{'sql (ms)':>12}{'snapshot (ms)':>16}{'speedup':>10}")
+        for label, params in self.scenarios:
+            sql_ms = self._time(lambda: self._sql_page(params, page_size), iterations)
+            snapshot_ms = self._time(lambda: self._snapshot_page(catalog, params, page_size), iterations)
+            speedup = sql_ms / snapshot_ms if snapshot_ms else float('inf')
+            self.stdout.write(f'{label:<34}{sql_ms:>12.3f}{snapshot_ms:>16.3f}{speedup:>9.1f}x')
+
+    def _time(self, func, iterations):
+        func()  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) * 1000 / iterations
+
+    def _sql_page(self, params, page_size):
+        queryset = SKU.objects.all()
+        for term in params.get('search_terms', ()):
+            queryset = queryset.filter(Q(name__icontains=term))
+        if params.get('filter_type') == 'high_return_rate':
+            queryset = queryset.filter(return_percentage__gt=SKU.get_high_return_rate())
+        elif params.get('filter_type') == 'low_content_score':
+            queryset = queryset.filter(content_score__lt=SKU.get_low_content_score())
+        if params.get('ordering'):
+            queryset = queryset.order_by(*params['ordering'].split(','))
+        queryset.count()
+        return list(queryset.values('sku_id', 'name', 'sales', 'return_percentage', 'content_score')[:page_size])
+
+    def _snapshot_page(self, catalog, params, page_size):
+        positions = catalog.query(**params)
+        len(positions)
+        return catalog.rows(positions)[:page_size]
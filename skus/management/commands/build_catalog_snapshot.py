@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from skus import snapshot
+
+
+class Command(BaseCommand):
+    """
+    Django management command to (re)build the columnar SKU catalog snapshot
+    shared by all workers on this host.
+    """
+    help = 'Builds the memory-mapped columnar snapshot of the SKU catalog.'
+
+    def handle(self, *args, **kwargs):
+        if snapshot.np is None:
+            raise CommandError('NumPy is not installed, the catalog snapshot is unavailable.')
+
+        count = snapshot.build_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Built catalog snapshot with {count} SKUs in {snapshot.snapshot_dir()}.'))
@@ -9,6 +9,8 @@ from django.db.models import Sum # Import Sum for aggregation
 from rest_framework.authtoken.models import Token
 
 from skus.models import SKU, Note, SKUDailyMetric
+from skus.caching import bump_version
+from skus.snapshot import mark_stale
 
 
 class Command(BaseCommand):
@@ -103,6 +105,10 @@ class Command(BaseCommand):
             )
         SKU.objects.bulk_create(skus_to_create)
         self.stdout.write(self.style.SUCCESS(f'Successfully created {len(skus_to_create)} SKUs in bulk.'))
+        # bulk_create does not send signals, so expire catalog caches explicitly
+        bump_version('catalog')
+        bump_version('leaderboards')
+        mark_stale()
 
         # Fetch created SKUs to get their IDs for related objects
         sku_map = {sku.sku_id: sku for sku in SKU.objects.all()}
@@ -129,6 +135,7 @@ class Command(BaseCommand):
 
         SKUDailyMetric.objects.bulk_create(daily_metrics_to_create)
         self.stdout.write(self.style.SUCCESS(f'Successfully created {len(daily_metrics_to_create)} daily metrics in bulk.'))
+        bump_version('leaderboards')
 
         # --- Create Notes ---
         skus = list(SKU.objects.all())
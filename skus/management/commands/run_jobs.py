@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from skus import jobs, worker
+
+
+class Command(BaseCommand):
+    """
+    Django management command that runs queued background jobs in a
+    thread or process pool.
+    """
+    help = 'Runs queued background jobs from the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, "SKU_JOBS_WORKERS", 2),
+                            help='Number of jobs to run concurrently.')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                            help='Run jobs in a thread pool or a process pool.')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait between polls of an empty queue.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained instead of polling forever.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        self.release_stale_jobs()
+
+        executor = self.make_executor(options['mode'], workers)
+        run_job = worker.run_job if options['mode'] == 'process' else jobs.run_job
+
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} running {workers} {options["mode"]}(s). Registered jobs: {", ".join(jobs.registered_jobs())}'))
+
+        heartbeat_interval = getattr(settings, "SKU_JOBS_HEARTBEAT_INTERVAL", 30)
+        last_heartbeat = time.monotonic()
+        running = {}
+        try:
+            while True:
+                if time.monotonic() - last_heartbeat >= heartbeat_interval:
+                    # Keep our own jobs alive and release those of dead workers.
+                    jobs.heartbeat(running.values())
+                    self.release_stale_jobs()
+                    last_heartbeat = time.monotonic()
+
+                for future in [future for future in running if future.done()]:
+                    job_id = running.pop(future)
+                    if future.exception():
+                        self.stdout.write(self.style.ERROR(f'Job {job_id} crashed: {future.exception()}'))
+                        jobs.release_crashed_job(job_id, repr(future.exception()))
+                    else:
+                        self.stdout.write(f'Job {job_id} finished.')
+
+                claimed = False
+                while len(running) < workers:
+                    job_id = jobs.claim_next(worker_id)
+                    if job_id is None:
+                        break
+                    claimed = True
+                    try:
+                        future = executor.submit(run_job, job_id)
+                    except BrokenProcessPool:
+                        # A crashed child broke the pool. Its running jobs fail
+                        # with BrokenProcessPool and are released above on the
+                        # next pass, the job just claimed never started.
+                        self.stdout.write(self.style.ERROR('Process pool broken, restarting it.'))
+                        jobs.unclaim(job_id)
+                        executor.shutdown(wait=False)
+                        executor = self.make_executor(options['mode'], workers)
+                        break
+                    self.stdout.write(f'Job {job_id} started.')
+                    running[future] = job_id
+
+                if options['once'] and not claimed and not running:
+                    break
+                if not claimed:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Shutting down, waiting for running jobs...'))
+        finally:
+            executor.shutdown(wait=True)
+
+    def make_executor(self, mode, workers):
+        if mode == 'process':
+            # Spawned processes set Django up themselves instead of inheriting
+            # this process's database connections.
+            connections.close_all()
+            return ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=worker.init_process,
+            )
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def release_stale_jobs(self):
+        requeued, failed = jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s).'))
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Failed {failed} stale job(s) that were out of attempts.'))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from skus.warmup import warm_up
+
+
+class Command(BaseCommand):
+    """
+    Django management command running the worker warm-up and printing
+    the startup-time report.
+    """
+    help = 'Warms URL resolvers, serializers, database connections and caches, and reports the time of each step.'
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        report = warm_up()
+        total = time.perf_counter() - started
+
+        for step, seconds, ok in report:
+            line = f'{step:<24}{seconds * 1000:>10.1f} ms'
+            self.stdout.write(line if ok else self.style.ERROR(f'{line}  failed, see log'))
+        self.stdout.write(self.style.SUCCESS(f"{'total':<24}{total * 1000:>10.1f} ms"))
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:05
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgreSQL(AddIndexConcurrently):
+    """
+    Builds the index with CREATE INDEX CONCURRENTLY on PostgreSQL, so the
+    large note and metric tables stay writable meanwhile, and with a plain
+    CREATE INDEX on other databases.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('skus', '0002_remove_sku_returns_sku_return_percentage_note_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='sku',
+            name='content_score',
+            field=models.FloatField(db_index=True, default=0.0, verbose_name='Content Score'),
+        ),
+        migrations.AlterField(
+            model_name='sku',
+            name='name',
+            field=models.CharField(db_index=True, max_length=255, verbose_name='Product Name'),
+        ),
+        migrations.AlterField(
+            model_name='sku',
+            name='return_percentage',
+            field=models.FloatField(db_index=True, default=0, verbose_name='Returns Percentage'),
+        ),
+        migrations.AlterField(
+            model_name='sku',
+            name='sales',
+            field=models.IntegerField(db_index=True, default=0, verbose_name='Total Sales'),
+        ),
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name='note',
+            index=models.Index(fields=['created_at', 'id'], name='skus_note_created_063d26_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgreSQL(
+            model_name='skudailymetric',
+            index=models.Index(fields=['date', 'id'], name='skus_skudai_date_b779f1_idx'),
+        ),
+    ]
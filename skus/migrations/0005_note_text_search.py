@@ -0,0 +1,83 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# Note: Django rebuilds SQLite tables when altering them, which drops these
+# triggers; migrations altering `skus_note` must recreate them.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE skus_note_fts USING fts5(text, content='skus_note', content_rowid='id')",
+    """
+    CREATE TRIGGER skus_note_fts_ai AFTER INSERT ON skus_note BEGIN
+        INSERT INTO skus_note_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER skus_note_fts_ad AFTER DELETE ON skus_note BEGIN
+        INSERT INTO skus_note_fts(skus_note_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER skus_note_fts_au AFTER UPDATE OF text ON skus_note BEGIN
+        INSERT INTO skus_note_fts(skus_note_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO skus_note_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    "INSERT INTO skus_note_fts(skus_note_fts) VALUES ('rebuild')",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS skus_note_fts_ai",
+    "DROP TRIGGER IF EXISTS skus_note_fts_ad",
+    "DROP TRIGGER IF EXISTS skus_note_fts_au",
+    "DROP TABLE IF EXISTS skus_note_fts",
+]
+
+# PostgreSQL: a GIN index on the tsvector expression used by searches,
+# maintained by PostgreSQL on every insert and update. Built concurrently
+# so the notes table stays writable meanwhile.
+POSTGRESQL_FORWARD = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS skus_note_text_search_idx ON skus_note USING GIN (to_tsvector('english', text))",
+]
+POSTGRESQL_BACKWARD = [
+    "DROP INDEX CONCURRENTLY IF EXISTS skus_note_text_search_idx",
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for sql in POSTGRESQL_FORWARD:
+            schema_editor.execute(sql)
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQLITE_FORWARD:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5, searches fall back to LIKE.
+            for sql in SQLITE_BACKWARD:
+                schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_BACKWARD
+    elif vendor == 'sqlite':
+        statements = SQLITE_BACKWARD
+    else:
+        statements = []
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('skus', '0004_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 12:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('skus', '0005_note_text_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Last Heartbeat'),
+        ),
+    ]
@@ -1,15 +1,20 @@
 from django.db import models
 from django.conf import settings
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent with `sku_pks` after notes or daily metrics were deleted directly.
+sku_rows_deleted = Signal()
 
 class SKU(models.Model):
     """
     Represents a Stock Keeping Unit (SKU) with various attributes.
     """
     sku_id = models.CharField(max_length=100, unique=True, verbose_name="SKU ID")
-    name = models.CharField(max_length=255, verbose_name="Product Name")
-    sales = models.IntegerField(default=0, verbose_name="Total Sales")
-    return_percentage = models.FloatField(default=0, verbose_name="Returns Percentage")
-    content_score = models.FloatField(default=0.0, verbose_name="Content Score")
+    name = models.CharField(max_length=255, db_index=True, verbose_name="Product Name")
+    sales = models.IntegerField(default=0, db_index=True, verbose_name="Total Sales")
+    return_percentage = models.FloatField(default=0, db_index=True, verbose_name="Returns Percentage")
+    content_score = models.FloatField(default=0.0, db_index=True, verbose_name="Content Score")
 
     class Meta:
         verbose_name = "SKU"
@@ -28,7 +33,31 @@ class SKU(models.Model):
         return getattr(settings, "LOW_CONTENT_SCORE", 6.0)
 
 
-class Note(models.Model):
+class SKURowQuerySet(models.QuerySet):
+    """
+    QuerySet for rows belonging to a SKU. Deletes are announced with
+    `sku_rows_deleted` instead of `post_delete` receivers, which would
+    disable Django's fast delete and load every note and metric row when
+    a SKU is deleted. Cascades from a SKU are handled by the SKU's own
+    `post_delete` receivers.
+    """
+
+    def delete(self):
+        sku_pks = set(self.order_by().values_list('sku_id', flat=True).distinct())
+        result = super().delete()
+        sku_rows_deleted.send(sender=self.model, sku_pks=sku_pks)
+        return result
+
+
+class SKURowMixin:
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        sku_rows_deleted.send(sender=type(self), sku_pks={self.sku_id})
+        return result
+
+
+class Note(SKURowMixin, models.Model):
     """
     Represents a follow-up note associated with a specific SKU.
     """
@@ -44,16 +73,21 @@ class Note(models.Model):
         verbose_name="Created By"
     )
 
+    objects = SKURowQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Note"
         verbose_name_plural = "Notes"
         ordering = ['-created_at'] # Order notes by most recent first
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
 
     def __str__(self):
         return f"Note for {self.sku.name} ({self.created_at.strftime('%Y-%m-%d %H:%M')})"
 
 
-class SKUDailyMetric(models.Model):
+class SKUDailyMetric(SKURowMixin, models.Model):
     """
     Stores daily sales metrics for a specific SKU.
     """
@@ -62,13 +96,71 @@ class SKUDailyMetric(models.Model):
     sales_units = models.IntegerField(default=0, verbose_name="Sales Units")
     returns_units = models.IntegerField(default=0, verbose_name="Returned Units")
 
+    objects = SKURowQuerySet.as_manager()
+
     class Meta:
         verbose_name = "SKU Daily Metric"
         verbose_name_plural = "SKU Daily Metrics"
         unique_together = ('sku', 'date') # Ensure only one entry per SKU per day
         ordering = ['date'] # Order metrics by date
+        indexes = [
+            models.Index(fields=['date', 'id']),
+        ]
 
     def __str__(self):
         return f"Daily Sales for {self.sku.name} on {self.date}: {self.sales_units} units"
 
 
+
+
+class Job(models.Model):
+    """
+    A unit of background work stored in the database and executed by
+    the `run_jobs` management command.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="Job Name")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Parameters")
+    priority = models.IntegerField(default=0, verbose_name="Priority") # Higher priority jobs run first
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED, verbose_name="Status")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Attempts")
+    max_attempts = models.PositiveIntegerField(default=3, verbose_name="Max Attempts")
+    progress = models.FloatField(default=0.0, verbose_name="Progress") # Fraction between 0 and 1
+    progress_message = models.CharField(max_length=255, blank=True, verbose_name="Progress Message")
+    result = models.JSONField(null=True, blank=True, verbose_name="Result")
+    error = models.TextField(blank=True, verbose_name="Last Error")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Run After")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Locked By")
+    created_by = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs_created',
+        verbose_name="Created By"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started At")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="Last Heartbeat") # Touched while a worker runs the job
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished At")
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,126 @@
+"""
+Cached API payloads shared by the API views and the server-rendered pages.
+"""
+import copy
+import datetime
+from urllib.parse import urlsplit, urlunsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import QueryDict
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from .caching import versioned_key
+from .models import SKU
+from .roles import role_cache_key
+from .serializers import SKUDetailsSerializer
+from .singleflight import get_or_compute
+
+# `filter_type` values whose first page is cached, the dashboard's attention lists
+ATTENTION_FILTERS = ('high_return_rate', 'low_content_score')
+
+
+def _sku_pk_key(sku_id):
+    return f'skus:sku_pk:{sku_id}'
+
+
+def forget_sku_pk(sku_id):
+    """
+    Drops the cached primary key of a SKU ID, called when a SKU is saved or deleted.
+    """
+    cache.delete(_sku_pk_key(sku_id))
+
+
+class _SKUMoved(Exception):
+    """
+    Raised when a cached SKU ID mapping points to another primary key.
+    """
+
+    def __init__(self, sku):
+        super().__init__(sku.sku_id)
+        self.sku = sku
+
+
+def _remember_sku_pk(sku):
+    cache.set(_sku_pk_key(sku.sku_id), sku.pk, getattr(settings, "SKU_PK_CACHE_TIMEOUT", 3600))
+
+
+def _detail_payload(request, sku_id, pk, sku=None):
+    today = datetime.date.today()
+    cache_key = versioned_key(f'sku:{pk}', 'detail', role_cache_key(request.user), today.isoformat())
+
+    def compute():
+        instance = sku or get_object_or_404(SKU, sku_id=sku_id)
+        if instance.pk != pk:
+            raise _SKUMoved(instance)
+        return SKUDetailsSerializer(instance, context={'request': request}).data
+
+    return get_or_compute(cache_key, compute, getattr(settings, "SKU_PAGE_CACHE_TIMEOUT", 60))
+
+
+def sku_detail_payload(request, sku_id):
+    """
+    Returns the serialized SKU detail for the requesting user's role.
+    Concurrent requests for the same SKU and role share one computation.
+    Raises Http404 for unknown SKUs.
+
+    Payloads are versioned by the SKU's primary key, which notes and
+    metrics carry themselves, so the SKU ID is mapped to it through the cache.
+    """
+    pk = cache.get(_sku_pk_key(sku_id))
+    if pk is None:
+        sku = get_object_or_404(SKU, sku_id=sku_id)
+        _remember_sku_pk(sku)
+        return _detail_payload(request, sku_id, sku.pk, sku)
+
+    try:
+        return _detail_payload(request, sku_id, pk)
+    except _SKUMoved as exc:
+        # The SKU ID now belongs to another row (deleted and recreated, or
+        # renamed, possibly by another process), so remap it.
+        _remember_sku_pk(exc.sku)
+        return _detail_payload(request, sku_id, exc.sku.pk, exc.sku)
+
+
+def _relative_link(link):
+    if link is None:
+        return None
+    parts = urlsplit(link)
+    return urlunsplit(('', '', parts.path, parts.query, parts.fragment))
+
+
+def sku_list_first_page(request, filter_type=None):
+    """
+    Returns the first page of the SKU list, unfiltered or for one of the
+    `ATTENTION_FILTERS`, exactly as `GET /api/skus/` would. The list does
+    not depend on the user's role, so one cached copy is shared by all
+    users. Its pagination links are cached as relative URLs and made
+    absolute for each request.
+    """
+    from .views import SKUListAPIView, StandardResultsSetPagination
+
+    cache_key = versioned_key('catalog', 'first_page', filter_type or 'all', StandardResultsSetPagination.page_size)
+
+    def compute():
+        # Render the page as if requested from the API endpoint itself,
+        # ignoring the query string of the page being rendered.
+        query = QueryDict(mutable=True)
+        if filter_type:
+            query['filter_type'] = filter_type
+        api_request = copy.copy(request)
+        api_request.GET = query
+        api_request.META = dict(request.META, QUERY_STRING=query.urlencode())
+        api_request.path = reverse('api_sku_list')
+
+        view = SKUListAPIView(args=(), kwargs={}, format_kwarg=None)
+        view.request = view.initialize_request(api_request)
+        data = view.list_uncached(view.request).data
+        return dict(data, next=_relative_link(data['next']), previous=_relative_link(data['previous']))
+
+    data = get_or_compute(cache_key, compute, getattr(settings, "SKU_PAGE_CACHE_TIMEOUT", 60))
+    return dict(
+        data,
+        next=data['next'] and request.build_absolute_uri(data['next']),
+        previous=data['previous'] and request.build_absolute_uri(data['previous']),
+    )
@@ -0,0 +1,144 @@
+"""
+Query budgets and N+1 detection.
+
+Views and serializers declare the maximum number of SQL queries they may
+run with a `query_budget` class attribute. `QueryBudgetMiddleware` counts
+every query of a request against the view's budget (or
+`QUERY_BUDGET_DEFAULT`). Serializers using `QueryBudgetSerializerMixin`
+are checked each time they serialize an object, or a whole list with
+`QueryBudgetListSerializer`. Within each scope, the same SQL
+statement (ignoring parameters) running `QUERY_BUDGET_REPEAT_THRESHOLD`
+times or more is reported as a likely N+1 pattern.
+
+`QUERY_BUDGET_MODE` decides what happens on a violation: 'off' (no
+counting), 'log' (log a warning) or 'raise' (raise QueryBudgetExceeded).
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def get_mode():
+    return getattr(settings, "QUERY_BUDGET_MODE", 'off')
+
+
+def normalize_sql(sql):
+    """
+    Reduces a statement to its shape, so queries differing only in their
+    parameters (or the length of an IN list) compare equal.
+    """
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryBudget:
+    """
+    Context manager counting the queries run inside it.
+    """
+
+    def __init__(self, name, max_queries=None):
+        self.name = name
+        self.max_queries = max_queries
+        self.statements = Counter()
+        self._stack = None
+
+    @property
+    def count(self):
+        return sum(self.statements.values())
+
+    def __call__(self, execute, sql, params, many, context):
+        self.statements[normalize_sql(sql)] += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        if get_mode() != 'off':
+            for connection in connections.all():
+                self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stack.close()
+        if exc_type is None:
+            self.check()
+        return False
+
+    def violations(self):
+        problems = []
+        if self.max_queries is not None and self.count > self.max_queries:
+            problems.append(f"Query budget exceeded for {self.name}: {self.count} queries (budget {self.max_queries})")
+        threshold = getattr(settings, "QUERY_BUDGET_REPEAT_THRESHOLD", 5)
+        for sql, times in self.statements.items():
+            if times >= threshold:
+                problems.append(f"Repeated query in {self.name} ({times}x, possible N+1): {sql[:300]}")
+        return problems
+
+    def check(self):
+        problems = self.violations()
+        if not problems:
+            return
+        if get_mode() == 'raise':
+            raise QueryBudgetExceeded('\n'.join(problems))
+        for problem in problems:
+            logger.warning(problem)
+
+
+class QueryBudgetMiddleware:
+    """
+    Checks every request against the `query_budget` of the view it resolves to.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if get_mode() == 'off':
+            return self.get_response(request)
+
+        with QueryBudget(request.path) as budget:
+            response = self.get_response(request)
+            budget.max_queries = getattr(request, '_query_budget', None)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        request._query_budget = getattr(view_class, 'query_budget', getattr(settings, "QUERY_BUDGET_DEFAULT", None))
+        return None
+
+
+class QueryBudgetListSerializer(serializers.ListSerializer):
+    """
+    List serializer checking the whole list against the child's
+    `query_budget`, so per-item queries show up as repeats. Enable it with
+    `Meta.list_serializer_class`.
+    """
+
+    def to_representation(self, data):
+        with QueryBudget(f'{type(self.child).__name__}(many=True)', self.child.query_budget):
+            return super().to_representation(data)
+
+
+class QueryBudgetSerializerMixin:
+    """
+    Checks serializing a single object against the serializer's `query_budget`.
+    """
+    query_budget = None
+
+    def to_representation(self, instance):
+        if isinstance(self.parent, QueryBudgetListSerializer):
+            # Items of a list are covered by the list's budget.
+            return super().to_representation(instance)
+        with QueryBudget(type(self).__name__, self.query_budget):
+            return super().to_representation(instance)
@@ -0,0 +1,31 @@
+"""
+Helpers for the `brand_user` / `merch_ops` group based roles.
+"""
+
+
+def user_group_names(user):
+    """
+    Returns the names of the user's groups, cached on the user object so
+    repeated permission checks within a request cost a single query.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    if not hasattr(user, '_skus_group_names'):
+        user._skus_group_names = frozenset(user.groups.values_list('name', flat=True))
+    return user._skus_group_names
+
+
+def role_cache_key(user):
+    """
+    Identifies which version of a SKU detail payload a user is allowed to
+    see. `merch_ops` users share one payload, `brand_user` payloads contain
+    the user's own notes and are therefore per user.
+    """
+    groups = user_group_names(user)
+    if not user.is_authenticated:
+        return 'anonymous'
+    if 'merch_ops' in groups:
+        return 'merch_ops'
+    if 'brand_user' in groups:
+        return f'brand_user:{user.pk}'
+    return 'user'
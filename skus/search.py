@@ -0,0 +1,88 @@
+"""
+Ranked full-text search over `Note.text`.
+
+PostgreSQL matches against a GIN-indexed `to_tsvector('english', text)`
+expression, SQLite against the `skus_note_fts` FTS5 table. Both are
+created by migration 0005 and maintained by the database itself on every
+note insert and update. Other backends fall back to `icontains`.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Note
+from .roles import user_group_names
+
+_fts_tables = {}
+
+
+def visible_notes(user):
+    """
+    Notes the user may read, following the same rules as
+    `SKUDetailsSerializer.get_notes`: `merch_ops` users see every note,
+    `brand_user` users only their own.
+    """
+    groups = user_group_names(user)
+    if 'merch_ops' in groups:
+        return Note.objects.all()
+    if 'brand_user' in groups:
+        return Note.objects.filter(created_by=user)
+    return Note.objects.none()
+
+
+def _has_fts_table(connection):
+    if connection.alias not in _fts_tables:
+        _fts_tables[connection.alias] = 'skus_note_fts' in connection.introspection.table_names()
+    return _fts_tables[connection.alias]
+
+
+def detect_full_text_search():
+    """
+    Checks every SQLite database for its FTS table up front (during the
+    warm-up), so a process's first search skips the introspection query.
+    """
+    for connection in connections.all():
+        if connection.vendor == 'sqlite':
+            _has_fts_table(connection)
+
+
+def search_notes(queryset, query):
+    """
+    Filters `queryset` to notes matching `query`, annotated with a `rank`
+    (higher is better) and ordered by it.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return queryset.none()
+
+    connection = connections[queryset.db]
+    table = Note._meta.db_table
+
+    if connection.vendor == 'postgresql':
+        document = f"to_tsvector('english', {table}.text)"
+        return queryset.alias(
+            matches=RawSQL(f"{document} @@ plainto_tsquery('english', %s)", (query,), output_field=BooleanField())
+        ).filter(matches=True).annotate(
+            rank=RawSQL(f"ts_rank({document}, plainto_tsquery('english', %s))", (query,), output_field=FloatField())
+        ).order_by('-rank', '-created_at')
+
+    if connection.vendor == 'sqlite' and _has_fts_table(connection):
+        # Quote every term so user input cannot use FTS5 query syntax.
+        match = ' '.join(f'"{term}"' for term in terms)
+        return queryset.filter(
+            id__in=RawSQL("SELECT rowid FROM skus_note_fts WHERE skus_note_fts MATCH %s", (match,))
+        ).annotate(
+            # bm25() is lower for better matches, negate it so higher ranks first.
+            rank=RawSQL(
+                f"SELECT -bm25(skus_note_fts) FROM skus_note_fts WHERE skus_note_fts MATCH %s AND rowid = {table}.id",
+                (match,),
+                output_field=FloatField(),
+            )
+        ).order_by('-rank', '-created_at')
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(text__icontains=term)
+    return queryset.filter(condition).annotate(rank=Value(None, output_field=FloatField())).order_by('-created_at')
@@ -1,17 +1,24 @@
 import datetime
+import inspect
 from collections import defaultdict
 from rest_framework import serializers
-from .models import SKU, Note, SKUDailyMetric
+from .models import SKU, Note, SKUDailyMetric, Job
+from . import jobs
+from .query_budget import QueryBudgetListSerializer, QueryBudgetSerializerMixin
+from .roles import user_group_names
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(QueryBudgetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Note model.
     Used for displaying and creating notes via the API.
+    Querysets must select `created_by` to stay within the query budget.
     """
     created_by_username = serializers.SerializerMethodField() # New field to display username
+    query_budget = 1
 
     class Meta:
         model = Note
+        list_serializer_class = QueryBudgetListSerializer
         fields = ['id', 'sku', 'text', 'created_at', 'created_by_username']
         read_only_fields = ['id', 'sku', 'created_at', 'created_by', 'created_by_username'] # created_at and created_by are set automatically
 
@@ -21,6 +28,18 @@ class NoteSerializer(serializers.ModelSerializer):
         """
         return obj.created_by.username if obj.created_by else 'Anonymous'
 
+class NoteSearchResultSerializer(NoteSerializer):
+    """
+    Serializer for note search results, including the SKU and match rank.
+    """
+    sku_id = serializers.CharField(source='sku.sku_id', read_only=True)
+    sku_name = serializers.CharField(source='sku.name', read_only=True)
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(NoteSerializer.Meta):
+        fields = ['id', 'sku', 'sku_id', 'sku_name', 'text', 'created_at', 'created_by_username', 'rank']
+
+
 class SKUDailyMetricSerializer(serializers.ModelSerializer):
     """
     Serializer for the SKUDailyMetric model.
@@ -30,13 +49,14 @@ class SKUDailyMetricSerializer(serializers.ModelSerializer):
         fields = ['date', 'sales_units']
 
 
-class SKUDetailsSerializer(serializers.ModelSerializer):
+class SKUDetailsSerializer(QueryBudgetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the SKU model.
     Includes nested notes and daily metrics for the detail view.
     """
     notes = serializers.SerializerMethodField()
     daily_metrics = serializers.SerializerMethodField()
+    query_budget = 3 # User groups, notes and daily metrics
 
     
     def get_notes(self, obj):
@@ -47,12 +67,14 @@ class SKUDetailsSerializer(serializers.ModelSerializer):
         """
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            if request.user.groups.filter(name='merch_ops').exists():
+            group_names = user_group_names(request.user)
+            notes = obj.notes.select_related('created_by')
+            if 'merch_ops' in group_names:
                 # If user is in 'merch_ops' group, return all notes
-                return NoteSerializer(obj.notes.all(), many=True, context={'request': request}).data
+                return NoteSerializer(notes.all(), many=True, context={'request': request}).data
             
-            if request.user.groups.filter(name='brand_user').exists():
-                return NoteSerializer(obj.notes.filter(created_by=request.user), many=True, context={'request': request}).data
+            if 'brand_user' in group_names:
+                return NoteSerializer(notes.filter(created_by=request.user), many=True, context={'request': request}).data
         else:
             # Otherwise, return an empty list
             return []
@@ -92,10 +114,58 @@ class SKUDetailsSerializer(serializers.ModelSerializer):
         fields = ['id', 'sku_id', 'name', 'sales', 'return_percentage', 'content_score', 'notes', 'daily_metrics']
 
 
-class SKUListSerializer(serializers.ModelSerializer):
+class SKUListSerializer(QueryBudgetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the SKU model.
     """
+    query_budget = 0
+
     class Meta:
         model = SKU
+        list_serializer_class = QueryBudgetListSerializer
         fields = ['sku_id', 'name', 'sales', 'return_percentage', 'content_score']
+
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Job model.
+    Used for submitting background jobs and polling their status.
+    """
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'params', 'priority', 'status', 'attempts', 'max_attempts', 'progress',
+                  'progress_message', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['id', 'status', 'attempts', 'max_attempts', 'progress', 'progress_message',
+                            'result', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def validate_name(self, value):
+        if value not in jobs.registered_jobs():
+            raise serializers.ValidationError(f"Unknown job. Choose one of: {', '.join(jobs.registered_jobs())}")
+        return value
+
+    def validate_params(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError("Params must be a JSON object.")
+        return value
+
+    def validate(self, attrs):
+        """
+        Checks the params against the job function's signature, so bad
+        params are rejected here instead of failing every attempt.
+        """
+        registered = jobs.get_registered(attrs['name'])
+        try:
+            # The first argument is the JobContext passed by the runner.
+            inspect.signature(registered.func).bind(None, **attrs.get('params', {}))
+        except TypeError as exc:
+            raise serializers.ValidationError({'params': str(exc)})
+        return attrs
+
+    def create(self, validated_data):
+        return jobs.submit(
+            validated_data['name'],
+            params=validated_data.get('params'),
+            priority=validated_data.get('priority', 0),
+            user=validated_data.get('created_by'),
+        )
@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import leaderboards, snapshot
+from .caching import bump_version
+from .models import SKU, Note, SKUDailyMetric, sku_rows_deleted
+from .payloads import forget_sku_pk
+
+
+@receiver(post_save, sender=SKU)
+@receiver(post_delete, sender=SKU)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    """
+    Drops cached catalog-wide aggregates and the SKU's cached detail
+    payloads whenever a SKU changes. A deleted SKU's notes and metrics
+    cascade without signals, so this also covers them.
+    """
+    bump_version('catalog')
+    bump_version(f'sku:{instance.pk}')
+    forget_sku_pk(instance.sku_id)
+
+
+@receiver(post_save, sender=Note)
+@receiver(post_save, sender=SKUDailyMetric)
+def invalidate_sku_detail_cache(sender, instance, **kwargs):
+    """
+    Drops the cached detail payloads of the SKU a note or metric belongs to.
+    """
+    bump_version(f'sku:{instance.sku_id}')
+
+
+@receiver(sku_rows_deleted)
+def invalidate_deleted_rows(sender, sku_pks, **kwargs):
+    """
+    Drops the cached detail payloads (and, for metrics, the rolling-window
+    ranks) of SKUs whose notes or metrics were deleted directly.
+    """
+    for pk in sku_pks:
+        bump_version(f'sku:{pk}')
+    if sender is SKUDailyMetric and sku_pks:
+        transaction.on_commit(lambda: _update_windows(sku_pks))
+
+
+def _update_windows(sku_pks):
+    for sku in SKU.objects.filter(pk__in=sku_pks):
+        leaderboards.update_window(sku)
+
+
+@receiver(post_save, sender=SKU)
+def update_catalog_snapshot(sender, instance, created, **kwargs):
+    """
+    Patches attribute updates into the columnar snapshot, new SKUs make it stale.
+    """
+    if created:
+        transaction.on_commit(snapshot.mark_stale)
+    else:
+        transaction.on_commit(lambda: snapshot.patch_sku(instance))
+
+
+@receiver(post_delete, sender=SKU)
+def expire_catalog_snapshot(sender, instance, **kwargs):
+    transaction.on_commit(snapshot.mark_stale)
+
+
+@receiver(post_save, sender=SKU)
+def update_sku_leaderboards(sender, instance, **kwargs):
+    transaction.on_commit(lambda: leaderboards.update_sku(instance))
+
+
+@receiver(post_delete, sender=SKU)
+def remove_sku_from_leaderboards(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: leaderboards.remove_sku(pk))
+
+
+@receiver(post_save, sender=SKUDailyMetric)
+def update_window_leaderboards(sender, instance, **kwargs):
+    """
+    Re-ranks the SKU on the rolling-window boards when one of its
+    daily metrics changes.
+    """
+    sku = instance.sku
+    transaction.on_commit(lambda: leaderboards.update_window(sku))
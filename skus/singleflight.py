@@ -0,0 +1,142 @@
+"""
+Request coalescing ("single-flight") for expensive, identical reads.
+
+Concurrent callers asking for the same key share one computation instead
+of each hitting the database. Results are cached with a freshness window
+followed by a stale window: once an entry goes stale, one caller refreshes
+it while everyone else keeps getting the stale value.
+
+Within a worker, callers are coalesced with a lock per key. With
+`SKU_SINGLEFLIGHT_SHARED` enabled, the workers of a host also coordinate
+through lock files under `SKU_SINGLEFLIGHT_LOCK_DIR`: one worker computes
+while the others wait for its result to land in the shared cache.
+"""
+import hashlib
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .locks import file_lock
+
+LOCK_STRIPES = 64 # Keys are hashed onto a fixed set of lock files, so they never pile up
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a function at most once at a time per key within this process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, func):
+        """
+        Calls `func()` unless a call for `key` is already running, in which
+        case its result (or exception) is shared with this caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_group = SingleFlight()
+
+
+def _is_shared():
+    return getattr(settings, "SKU_SINGLEFLIGHT_SHARED", False)
+
+
+def _shared_lock(cache_key):
+    stripe = int(hashlib.sha1(cache_key.encode()).hexdigest(), 16) % LOCK_STRIPES
+    lock_dir = Path(getattr(settings, "SKU_SINGLEFLIGHT_LOCK_DIR", settings.BASE_DIR / 'var' / 'singleflight'))
+    return file_lock(lock_dir / f'{stripe}.lock', blocking=False)
+
+
+def _fresh_value(cache_key):
+    entry = cache.get(cache_key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry
+    return None
+
+
+def _store(cache_key, func, timeout, stale_timeout):
+    value = func()
+    entry = {'value': value, 'fresh_until': time.time() + timeout}
+    cache.set(cache_key, entry, timeout + stale_timeout)
+    return value
+
+
+def _compute_and_store(cache_key, func, timeout, stale_timeout):
+    if not _is_shared():
+        return _store(cache_key, func, timeout, stale_timeout)
+
+    deadline = time.monotonic() + getattr(settings, "SKU_SINGLEFLIGHT_LOCK_TIMEOUT", 5)
+    while True:
+        with _shared_lock(cache_key) as locked:
+            if locked:
+                return _store(cache_key, func, timeout, stale_timeout)
+        # Another worker is computing the value, wait for it to land.
+        if time.monotonic() >= deadline:
+            return _store(cache_key, func, timeout, stale_timeout)
+        time.sleep(0.05)
+        entry = _fresh_value(cache_key)
+        if entry is not None:
+            return entry['value']
+
+
+def _refreshing_elsewhere(cache_key):
+    with _shared_lock(cache_key) as locked:
+        return not locked
+
+
+def get_or_compute(cache_key, func, timeout, stale_timeout=None):
+    """
+    Returns the cached value for `cache_key`, computing it with `func()`
+    at most once across concurrent callers. Stale values are served for
+    up to `stale_timeout` seconds while a single caller refreshes them.
+    """
+    if stale_timeout is None:
+        stale_timeout = getattr(settings, "SKU_SINGLEFLIGHT_STALE_TIMEOUT", 10)
+
+    entry = cache.get(cache_key)
+    if entry is not None:
+        if entry['fresh_until'] > time.time():
+            return entry['value']
+        if _group.in_flight(cache_key) or (_is_shared() and _refreshing_elsewhere(cache_key)):
+            return entry['value']
+
+    return _group.do(cache_key, lambda: _compute_and_store(cache_key, func, timeout, stale_timeout))
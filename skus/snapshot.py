@@ -0,0 +1,307 @@
+"""
+In-process columnar snapshot of the SKU catalog.
+
+The snapshot stores every SKU as NumPy columns in `.npy` files which each
+worker memory-maps, so all gunicorn workers on a host share one copy of the
+data through the page cache. Rows are stored in the default `name` ordering
+of the SKU model, so a row's position doubles as its name rank.
+
+Freshness is tracked with a generation token written to the snapshot
+directory. Any SKU change writes a new token, which makes the current
+snapshot stale until it is rebuilt; plain attribute updates are patched
+into the shared columns in place instead. Callers fall back to the ORM
+whenever `get_snapshot()` returns None. Rebuilds never run on the request
+path, a stale snapshot queues a `build_catalog_snapshot` job instead.
+"""
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import jobs
+from .locks import file_lock
+from .models import SKU, Job
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, views use the ORM without it
+    np = None
+
+NUMERIC_COLUMNS = ('id', 'sales', 'return_percentage', 'content_score')
+STRING_COLUMNS = ('sku_id', 'name', 'name_lower')
+ORDERING_FIELDS = ('name', 'sales', 'return_percentage', 'content_score')
+REBUILD_REQUEST_TIMEOUT = 300 # Seconds before a stale generation may queue another rebuild
+
+_loaded = None
+
+
+def is_enabled():
+    return np is not None and getattr(settings, "SKU_SNAPSHOT_ENABLED", False)
+
+
+def snapshot_dir():
+    return Path(getattr(settings, "SKU_SNAPSHOT_DIR", Path(settings.BASE_DIR) / 'var' / 'catalog_snapshot'))
+
+
+def _read_token(name):
+    try:
+        return (snapshot_dir() / name).read_text().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _write_token(name, value):
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / f".{name}.{uuid.uuid4().hex}"
+    tmp_path.write_text(value)
+    os.replace(tmp_path, directory / name)
+
+
+def mark_stale():
+    """
+    Invalidates the snapshot for every worker. A unique token is written
+    (rather than a counter) so concurrent writers can never produce a value
+    that matches a snapshot built before their change.
+    """
+    if np is None or not snapshot_dir().exists():
+        # No snapshot has ever been built, so there is nothing to invalidate.
+        return
+    _write_token('generation', uuid.uuid4().hex)
+
+
+class CatalogSnapshot:
+    """
+    Read-only view over one built snapshot.
+    """
+
+    def __init__(self, path, generation, mmap_mode='r'):
+        self.path = Path(path)
+        self.generation = generation
+        self.columns = {
+            column: np.load(self.path / f'{column}.npy', mmap_mode=mmap_mode)
+            for column in NUMERIC_COLUMNS + STRING_COLUMNS + ('id_order',)
+        }
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def row_for_pk(self, pk):
+        """
+        Returns the row position of a SKU primary key, or None.
+        """
+        ids = self.columns['id']
+        id_order = self.columns['id_order']
+        position = np.searchsorted(ids, pk, sorter=id_order)
+        if position < len(id_order) and ids[id_order[position]] == pk:
+            return int(id_order[position])
+        return None
+
+    def query(self, search_terms=(), filter_type=None, ordering=None):
+        """
+        Returns the row positions matching the same search, `filter_type`
+        and `ordering` semantics as `SKUListAPIView`. `search_terms` are
+        parsed by `SearchFilter.get_search_terms()`, so quoted phrases
+        behave as they do against the database.
+        """
+        mask = np.ones(len(self), dtype=bool)
+
+        for term in search_terms:
+            mask &= np.char.find(self.columns['name_lower'], term.lower()) != -1
+
+        if filter_type:
+            if filter_type.lower() == 'high_return_rate':
+                mask &= self.columns['return_percentage'] > SKU.get_high_return_rate()
+            elif filter_type.lower() == 'low_content_score':
+                mask &= self.columns['content_score'] < SKU.get_low_content_score()
+
+        rows = np.flatnonzero(mask)
+
+        keys = []
+        for field in (ordering or '').split(','):
+            field = field.strip()
+            if field.lstrip('-') not in ORDERING_FIELDS:
+                continue
+            name = field.lstrip('-')
+            # Rows are stored in name order, so the position is the name rank.
+            values = rows if name == 'name' else self.columns[name][rows]
+            keys.append(-values if field.startswith('-') else values)
+
+        if keys:
+            # np.lexsort treats the last key as the primary one.
+            rows = rows[np.lexsort(keys[::-1])]
+        return rows
+
+    def rows(self, positions):
+        return SnapshotRows(self, positions)
+
+
+class SnapshotRows:
+    """
+    Lazy sequence of SKU rows, only materialising the rows that are sliced
+    out of it (e.g. the requested page).
+    """
+
+    def __init__(self, snapshot, positions):
+        self.snapshot = snapshot
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(position) for position in self.positions[index]]
+        return self._row(self.positions[index])
+
+    def _row(self, position):
+        columns = self.snapshot.columns
+        return {
+            'sku_id': str(columns['sku_id'][position]),
+            'name': str(columns['name'][position]),
+            'sales': int(columns['sales'][position]),
+            'return_percentage': float(columns['return_percentage'][position]),
+            'content_score': float(columns['content_score'][position]),
+        }
+
+
+def _build_lock(blocking=True):
+    """
+    Holds the snapshot's `.lock` file, yielding whether it was acquired.
+    Builds and in-place patches hold it, so a patch can never land in a
+    build that is about to be replaced.
+    """
+    return file_lock(snapshot_dir() / '.lock', blocking)
+
+
+def build_snapshot():
+    """
+    Builds a new snapshot from the database and makes it current.
+    Returns the number of SKUs in the snapshot.
+    """
+    with _build_lock():
+        return _build()
+
+
+def _build():
+    directory = snapshot_dir()
+
+    generation = _read_token('generation')
+    if generation is None:
+        mark_stale()
+        generation = _read_token('generation')
+
+    rows = list(
+        SKU.objects.order_by('name', 'pk').values_list('id', 'sku_id', 'name', 'sales', 'return_percentage', 'content_score')
+    )
+    ids, sku_ids, names, sales, return_percentages, content_scores = zip(*rows) if rows else ((),) * 6
+
+    columns = {
+        'id': np.array(ids, dtype=np.int64),
+        'sales': np.array(sales, dtype=np.int64),
+        'return_percentage': np.array(return_percentages, dtype=np.float64),
+        'content_score': np.array(content_scores, dtype=np.float64),
+        'sku_id': np.array(sku_ids, dtype=str),
+        'name': np.array(names, dtype=str),
+        'name_lower': np.array([name.lower() for name in names], dtype=str),
+    }
+    columns['id_order'] = np.argsort(columns['id'], kind='stable')
+
+    build_path = directory / f'build-{uuid.uuid4().hex}'
+    build_path.mkdir()
+    for column, values in columns.items():
+        np.save(build_path / f'{column}.npy', values)
+    (build_path / 'generation').write_text(generation)
+
+    _write_token('current', build_path.name)
+
+    # Workers still holding the previous build keep their mappings alive,
+    # removing the directory only unlinks it.
+    for path in directory.glob('build-*'):
+        if path != build_path:
+            shutil.rmtree(path, ignore_errors=True)
+
+    return len(rows)
+
+
+def load_current():
+    """
+    Loads the most recently built snapshot, regardless of freshness.
+    """
+    current = _read_token('current')
+    build_generation = (snapshot_dir() / current / 'generation').read_text().strip()
+    return CatalogSnapshot(snapshot_dir() / current, build_generation)
+
+
+def _request_rebuild(generation):
+    """
+    Queues a `build_catalog_snapshot` job, at most once per stale generation.
+    """
+    if not cache.add(f'skus:snapshot:rebuild_requested:{generation}', 1, REBUILD_REQUEST_TIMEOUT):
+        return
+    if not Job.objects.filter(name='build_catalog_snapshot', status=Job.STATUS_QUEUED).exists():
+        jobs.submit('build_catalog_snapshot')
+
+
+def get_snapshot(rebuild=True):
+    """
+    Returns the current snapshot, or None if it is disabled, missing or
+    stale. With `SKU_SNAPSHOT_AUTO_REBUILD` the caller that first notices
+    a stale snapshot queues a rebuild job, callers use the ORM until it
+    has run.
+    """
+    global _loaded
+
+    if not is_enabled():
+        return None
+
+    generation = _read_token('generation')
+    current = _read_token('current')
+
+    if current and (_loaded is None or _loaded.path.name != current):
+        try:
+            _loaded = load_current()
+        except FileNotFoundError:
+            current = None
+
+    if current is None or generation is None or _loaded.generation != generation:
+        if rebuild and getattr(settings, "SKU_SNAPSHOT_AUTO_REBUILD", True):
+            _request_rebuild(generation)
+        return None
+
+    return _loaded
+
+
+def patch_sku(instance):
+    """
+    Writes the attributes of an updated SKU into the shared columns.
+    Changes that affect the row order (name) or identity (sku_id) cannot
+    be patched, so they mark the snapshot stale instead.
+    """
+    if np is None or not snapshot_dir().exists():
+        return
+
+    with _build_lock(blocking=False) as locked:
+        # A running build may have read the rows before this change, so
+        # a new generation makes sure its result is never served as fresh.
+        snapshot = get_snapshot(rebuild=False) if locked else None
+        if snapshot is None:
+            mark_stale()
+            return
+
+        position = snapshot.row_for_pk(instance.pk)
+        if (
+            position is None
+            or str(snapshot.columns['name'][position]) != instance.name
+            or str(snapshot.columns['sku_id'][position]) != instance.sku_id
+        ):
+            mark_stale()
+            return
+
+        writable = CatalogSnapshot(snapshot.path, snapshot.generation, mmap_mode='r+')
+        for column in ('sales', 'return_percentage', 'content_score'):
+            writable.columns[column][position] = getattr(instance, column)
+            writable.columns[column].flush()
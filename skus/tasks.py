@@ -0,0 +1,59 @@
+"""
+Background jobs available to `manage.py run_jobs` and `/api/jobs/`.
+"""
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Sum
+
+from . import snapshot
+from .jobs import register
+from .models import SKU, SKUDailyMetric
+
+
+@register(max_attempts=1, staff_only=True)
+def load_dummy_data(context):
+    """
+    Runs the `load_dummy_data` management command. Staff only, as the
+    command creates a superuser with a well-known password.
+    """
+    output = StringIO()
+    call_command('load_dummy_data', stdout=output)
+    return {'output': output.getvalue()}
+
+
+@register()
+def build_catalog_snapshot(context):
+    """
+    Rebuilds the columnar catalog snapshot.
+    """
+    if snapshot.np is None:
+        raise RuntimeError('NumPy is not installed, the catalog snapshot is unavailable.')
+    return {'skus': snapshot.build_snapshot()}
+
+
+@register()
+def recompute_sku_sales(context, batch_size=500):
+    """
+    Rolls daily metrics up into `SKU.sales` for every SKU.
+    """
+    total = SKU.objects.count()
+    updated = 0
+    sku_ids = SKU.objects.order_by('pk').values_list('pk', flat=True)
+    for start in range(0, total, batch_size):
+        batch = list(sku_ids[start:start + batch_size])
+        totals = dict(
+            SKUDailyMetric.objects.filter(sku_id__in=batch)
+            .order_by()
+            .values('sku_id')
+            .annotate(total=Sum('sales_units'))
+            .values_list('sku_id', 'total')
+        )
+        for sku in SKU.objects.filter(pk__in=batch):
+            sales = totals.get(sku.pk) or 0
+            if sku.sales != sales:
+                sku.sales = sales
+                sku.save(update_fields=['sales'])
+                updated += 1
+        context.progress(min(start + batch_size, total) / total, f'{min(start + batch_size, total)}/{total} SKUs')
+    return {'skus': total, 'updated': updated}
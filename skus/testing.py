@@ -0,0 +1,132 @@
+"""
+Test helpers for checking the `skus` endpoints against their query budgets.
+"""
+import datetime
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from . import search
+from .models import SKU, Note, SKUDailyMetric
+from .query_budget import QueryBudgetExceeded
+
+
+def seed_dataset(sku_count=20, notes_per_sku=6, days=10):
+    """
+    Creates both user groups with one user each, `sku_count` SKUs with
+    `days` of daily metrics and `notes_per_sku` notes by the brand user,
+    enough rows for per-object queries to show up as repeats.
+    Returns the users keyed by username.
+    """
+    brand_user_group, _ = Group.objects.get_or_create(name='brand_user')
+    merch_ops_group, _ = Group.objects.get_or_create(name='merch_ops')
+
+    brand_user = User.objects.create_user('branduser1', password='password123')
+    brand_user.groups.add(brand_user_group)
+    merch_ops_user = User.objects.create_user('merchops1', password='password123')
+    merch_ops_user.groups.add(merch_ops_group)
+
+    today = datetime.date.today()
+    skus = SKU.objects.bulk_create(
+        SKU(
+            sku_id=f'SKU{number:03d}',
+            name=f'Product {number}',
+            sales=number * 10,
+            return_percentage=number % 10,
+            content_score=number % 10,
+        )
+        for number in range(1, sku_count + 1)
+    )
+    SKUDailyMetric.objects.bulk_create(
+        SKUDailyMetric(
+            sku=sku,
+            date=today - datetime.timedelta(days=day),
+            sales_units=day + 1,
+            returns_units=day % 3,
+        )
+        for sku in skus
+        for day in range(days)
+    )
+    Note.objects.bulk_create(
+        Note(sku=sku, text=f'Follow up on packaging for {sku.name}', created_by=brand_user)
+        for sku in skus
+        for _ in range(notes_per_sku)
+    )
+    return {user.username: user for user in (brand_user, merch_ops_user)}
+
+
+class QueryBudgetTestMixin:
+    """
+    TestCase mixin requesting every registered `skus` endpoint with
+    `QUERY_BUDGET_MODE = 'raise'`, failing on budget violations.
+
+    `endpoint_kwargs` fills the URL parameters. `endpoint_requests` lists
+    the `(method, data)` requests sent to an endpoint, GET query strings or
+    JSON bodies; endpoints without an entry get a plain GET.
+    """
+    endpoint_kwargs = {'sku_id': 'SKU001', 'board': 'sales'}
+    endpoint_requests = {
+        'api_note_create': [('post', {'text': 'Checked the packaging again'})],
+        'api_note_update': [('get', {}), ('put', {'text': 'Packaging issue resolved'})],
+        'api_note_search': [('get', {'q': 'packaging'})],
+        'api_job_list': [('get', {}), ('post', {'name': 'recompute_sku_sales'})],
+    }
+
+    def get_endpoint_kwargs(self):
+        return dict(self.endpoint_kwargs, pk=Note.objects.order_by('pk').values_list('pk', flat=True).first())
+
+    def get_endpoint_urls(self):
+        from .urls import urlpatterns
+
+        kwargs = self.get_endpoint_kwargs()
+        for pattern in urlpatterns:
+            url_kwargs = {name: kwargs[name] for name in pattern.pattern.converters}
+            yield pattern.name, reverse(pattern.name, kwargs=url_kwargs)
+
+    def reset_process_state(self):
+        """
+        Forgets what a process only looks up once, such as the full-text
+        search backend, so the next request runs like a fresh worker's first.
+        """
+        search._fts_tables.clear()
+
+    def send(self, method, url, data):
+        if method == 'get':
+            return self.client.get(url, data)
+        return getattr(self.client, method)(url, data, content_type='application/json')
+
+    def assert_endpoints_within_budget(self, users):
+        """
+        Sends every endpoint's requests as each of `users`, starting from
+        an empty cache so the uncached (worst case) path is measured. Each
+        request is measured twice: as the first request of a fresh process
+        ('cold', per-process setup included) and of a warmed-up one ('warm').
+        Requests other than GETs must succeed for at least one user, so
+        their budgets are exercised.
+        """
+        succeeded = set()
+        with override_settings(QUERY_BUDGET_MODE='raise'):
+            for user in users:
+                self.client.force_login(user)
+                for name, url in self.get_endpoint_urls():
+                    for method, data in self.endpoint_requests.get(name, [('get', {})]):
+                        for phase in ('cold', 'warm'):
+                            cache.clear()
+                            if phase == 'cold':
+                                self.reset_process_state()
+                            with self.subTest(user=user.username, endpoint=name, method=method, phase=phase):
+                                try:
+                                    response = self.send(method, url, data)
+                                except QueryBudgetExceeded as exc:
+                                    self.fail(str(exc))
+                                self.assertLess(response.status_code, 500)
+                                if response.status_code < 300:
+                                    succeeded.add((name, method))
+                self.client.logout()
+
+        for name, requests in self.endpoint_requests.items():
+            for method, _ in requests:
+                if method != 'get':
+                    self.assertIn((name, method), succeeded, f'{method.upper()} {name} never succeeded')
@@ -1,3 +1,714 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import DisallowedHost
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import caching, jobs, leaderboards, payloads, search, singleflight, snapshot, warmup
+from .facets import FACET_FIELDS, bucket_ranges, get_facet_buckets
+from .models import SKU, Job, Note, SKUDailyMetric
+from .query_budget import QueryBudget, QueryBudgetExceeded
+from .testing import QueryBudgetTestMixin, seed_dataset
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset()
+
+    def test_endpoints_within_budget(self):
+        self.assert_endpoints_within_budget(self.users.values())
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_repeated_queries_raise(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget('notes'):
+                [note.created_by.username for note in Note.objects.all()[:10]]
+
+    @override_settings(QUERY_BUDGET_MODE='raise')
+    def test_budget_exceeded_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget('notes', max_queries=1):
+                list(Note.objects.all()[:1])
+                list(Note.objects.all()[1:2])
+
+
+class JobAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset(sku_count=2, notes_per_sku=1, days=1)
+
+    def test_merch_ops_cannot_submit_staff_only_job(self):
+        self.client.force_login(self.users['merchops1'])
+        response = self.client.post('/api/jobs/', {'name': 'load_dummy_data'}, content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Job.objects.exists())
+
+    def test_staff_can_submit_staff_only_job(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.post('/api/jobs/', {'name': 'load_dummy_data'}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_unknown_params_are_rejected(self):
+        self.client.force_login(self.users['merchops1'])
+        response = self.client.post(
+            '/api/jobs/', {'name': 'recompute_sku_sales', 'params': {'bogus': 1}}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('params', response.json())
+        self.assertFalse(Job.objects.exists())
+
+
+class StaleJobTests(TestCase):
+
+    def make_running_job(self, heartbeat_age, attempts=1, max_attempts=3):
+        now = timezone.now()
+        return Job.objects.create(
+            name='recompute_sku_sales',
+            status=Job.STATUS_RUNNING,
+            attempts=attempts,
+            max_attempts=max_attempts,
+            started_at=now - datetime.timedelta(hours=2),
+            heartbeat_at=now - datetime.timedelta(seconds=heartbeat_age),
+        )
+
+    def test_live_jobs_are_left_running(self):
+        job = self.make_running_job(heartbeat_age=10)
+        self.assertEqual(jobs.requeue_stale_jobs(), (0, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_RUNNING)
+
+    def test_stale_jobs_are_requeued_or_failed(self):
+        retryable = self.make_running_job(heartbeat_age=3600)
+        exhausted = self.make_running_job(heartbeat_age=3600, attempts=1, max_attempts=1)
+        self.assertEqual(jobs.requeue_stale_jobs(), (1, 1))
+        retryable.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual(retryable.status, Job.STATUS_QUEUED)
+        self.assertEqual(exhausted.status, Job.STATUS_FAILED)
+
+    def test_heartbeat_keeps_jobs_alive(self):
+        job = self.make_running_job(heartbeat_age=3600)
+        jobs.heartbeat([job.pk])
+        self.assertEqual(jobs.requeue_stale_jobs(), (0, 0))
+
+
+class SKUDeleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset(sku_count=2, notes_per_sku=6, days=10)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_deleting_a_sku_fast_deletes_its_rows(self):
+        sku = SKU.objects.get(sku_id='SKU001')
+        # Fast deletes of the notes and metrics, then the SKU itself.
+        with self.assertNumQueries(3):
+            sku.delete()
+        self.assertFalse(Note.objects.filter(sku_id=sku.pk).exists())
+
+    def test_deleting_a_note_invalidates_the_sku_detail(self):
+        self.client.force_login(self.users['merchops1'])
+        url = '/api/skus/SKU001/'
+        self.assertEqual(len(self.client.get(url).json()['notes']), 6)
+        Note.objects.filter(sku__sku_id='SKU001').first().delete()
+        self.assertEqual(len(self.client.get(url).json()['notes']), 5)
+        Note.objects.filter(sku__sku_id='SKU001').delete()
+        self.assertEqual(self.client.get(url).json()['notes'], [])
+
+    def test_recreated_sku_is_resolved_again(self):
+        self.client.force_login(self.users['merchops1'])
+        url = '/api/skus/SKU001/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        stale_pk = cache.get('skus:sku_pk:SKU001')
+
+        SKU.objects.get(sku_id='SKU001').delete()
+        SKU.objects.create(sku_id='SKU001', name='Recreated', sales=1, return_percentage=1, content_score=1)
+        # Another process may still hold the mapping to the deleted SKU.
+        cache.set('skus:sku_pk:SKU001', stale_pk)
+
+        with override_settings(QUERY_BUDGET_MODE='raise'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Recreated')
+        self.assertNotEqual(cache.get('skus:sku_pk:SKU001'), stale_pk)
+
+
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Sales are 10, 20, ... 200, return percentage and content score N % 10.
+        cls.users = seed_dataset(sku_count=20, notes_per_sku=0, days=1)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.users['merchops1'])
+
+    def get_facets(self, params=None):
+        response = self.client.get('/api/skus/facets/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    @override_settings(SKU_FACET_BUCKETS={'sales': [50, 100]})
+    def test_bucket_boundaries(self):
+        data = self.get_facets({'facets': 'sales'})
+        self.assertEqual(data['total'], 20)
+        # Lower bounds are inclusive and upper bounds exclusive, so 50 and
+        # 100 land in the buckets they start.
+        self.assertEqual(data['facets'], {'sales': [
+            {'min': None, 'max': 50, 'count': 4},
+            {'min': 50, 'max': 100, 'count': 5},
+            {'min': 100, 'max': None, 'count': 11},
+        ]})
+
+    def test_filtered_facets_match_database(self):
+        buckets = get_facet_buckets()
+        for params, queryset in (
+            ({'search': 'product 1'}, SKU.objects.filter(name__icontains='product 1')),
+            ({'filter_type': 'high_return_rate'}, SKU.objects.filter(return_percentage__gt=SKU.get_high_return_rate())),
+            ({'filter_type': 'low_content_score'}, SKU.objects.filter(content_score__lt=SKU.get_low_content_score())),
+        ):
+            with self.subTest(params=params):
+                data = self.get_facets(params)
+                self.assertEqual(data['total'], queryset.count())
+                for field in FACET_FIELDS:
+                    values = queryset.values_list(field, flat=True)
+                    expected = [
+                        sum(1 for value in values if (lower is None or value >= lower) and (upper is None or value < upper))
+                        for lower, upper in bucket_ranges(buckets[field])
+                    ]
+                    self.assertEqual([bucket['count'] for bucket in data['facets'][field]], expected)
+
+    def test_invalid_facets_are_rejected(self):
+        for value in ('sales,bogus', 'name', ',', ''):
+            with self.subTest(facets=value):
+                response = self.client.get('/api/skus/facets/', {'facets': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('facets', response.json())
+
+    def test_saving_a_sku_invalidates_cached_facets(self):
+        self.assertEqual(self.get_facets()['facets']['sales'][-1]['count'], 0)
+        sku = SKU.objects.get(sku_id='SKU001')
+        sku.sales = 5000
+        with self.captureOnCommitCallbacks(execute=True):
+            sku.save()
+        self.assertEqual(self.get_facets()['facets']['sales'][-1]['count'], 1)
+
+
+class NoteSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset(sku_count=2, notes_per_sku=0, days=1)
+        brand_user, merch_ops_user = cls.users['branduser1'], cls.users['merchops1']
+        other_brand_user = User.objects.create_user('branduser2')
+        other_brand_user.groups.add(Group.objects.get(name='brand_user'))
+        cls.users['branduser2'] = other_brand_user
+        cls.users['nogroup'] = User.objects.create_user('nogroup')
+
+        sku1, sku2 = SKU.objects.order_by('sku_id')
+        cls.strong = Note.objects.create(sku=sku1, text='Damaged packaging, packaging torn', created_by=brand_user)
+        cls.weak = Note.objects.create(
+            sku=sku2, text='Damaged box seen at the warehouse, customers also mention the packaging', created_by=brand_user
+        )
+        cls.foreign = Note.objects.create(sku=sku1, text='Packaging redesign approved', created_by=other_brand_user)
+        cls.ops = Note.objects.create(sku=sku2, text='Packaging supplier changed', created_by=merch_ops_user)
+
+    def search(self, username, params):
+        self.client.force_login(self.users[username])
+        return self.client.get('/api/notes/search/', params)
+
+    def result_ids(self, username, params):
+        response = self.search(username, params)
+        self.assertEqual(response.status_code, 200)
+        return [note['id'] for note in response.json()['results']]
+
+    def test_uses_full_text_search(self):
+        self.assertTrue(search._has_fts_table(connection))
+
+    def test_query_is_required(self):
+        for params in ({}, {'q': '  '}):
+            with self.subTest(params=params):
+                response = self.search('merchops1', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('q', response.json())
+
+    def test_merch_ops_search_all_notes(self):
+        self.assertCountEqual(
+            self.result_ids('merchops1', {'q': 'packaging'}),
+            [self.strong.pk, self.weak.pk, self.foreign.pk, self.ops.pk],
+        )
+
+    def test_brand_users_search_their_own_notes(self):
+        self.assertCountEqual(self.result_ids('branduser1', {'q': 'packaging'}), [self.strong.pk, self.weak.pk])
+        self.assertEqual(self.result_ids('branduser2', {'q': 'packaging'}), [self.foreign.pk])
+
+    def test_users_without_a_group_find_nothing(self):
+        self.assertEqual(self.result_ids('nogroup', {'q': 'packaging'}), [])
+
+    def test_results_are_ranked(self):
+        response = self.search('branduser1', {'q': 'damaged packaging'})
+        results = response.json()['results']
+        self.assertEqual([note['id'] for note in results], [self.strong.pk, self.weak.pk])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+    def test_sku_id_filter(self):
+        self.assertCountEqual(
+            self.result_ids('merchops1', {'q': 'packaging', 'sku_id': 'SKU002'}), [self.weak.pk, self.ops.pk]
+        )
+        self.assertEqual(self.result_ids('merchops1', {'q': 'packaging', 'sku_id': 'SKU999'}), [])
+
+    def test_index_follows_note_updates_and_deletes(self):
+        self.strong.text = 'Barcode label misprinted'
+        self.strong.save()
+        self.assertEqual(self.result_ids('merchops1', {'q': 'barcode'}), [self.strong.pk])
+        self.assertNotIn(self.strong.pk, self.result_ids('merchops1', {'q': 'packaging'}))
+
+        self.strong.delete()
+        self.assertEqual(self.result_ids('merchops1', {'q': 'barcode'}), [])
+
+
+class EmbeddedPayloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset(sku_count=30, notes_per_sku=2, days=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def embedded(self, url, element_id, **extra):
+        content = self.client.get(url, **extra).content.decode()
+        match = re.search(rf'<script id="{element_id}" type="application/json">(.*?)</script>', content, re.S)
+        return json.loads(match.group(1))
+
+    def test_pages_embed_the_api_payloads(self):
+        for username in ('branduser1', 'merchops1'):
+            with self.subTest(user=username):
+                self.client.force_login(self.users[username])
+                self.assertEqual(self.embedded('/', 'initial-skus'), self.client.get('/api/skus/').json())
+                self.assertEqual(
+                    self.embedded('/skus/SKU001/', 'initial-sku'), self.client.get('/api/skus/SKU001/').json()
+                )
+
+    def test_cached_attention_pages_match_database(self):
+        self.client.force_login(self.users['merchops1'])
+        for filter_type in payloads.ATTENTION_FILTERS:
+            with self.subTest(filter_type=filter_type):
+                cached = self.client.get('/api/skus/', {'filter_type': filter_type, 'page': 1}).json()
+                # An ordering parameter bypasses the cache.
+                uncached = self.client.get('/api/skus/', {'filter_type': filter_type, 'ordering': ''}).json()
+                self.assertEqual(cached['count'], uncached['count'])
+                self.assertEqual(cached['results'], uncached['results'])
+                self.assertEqual(cached['next'], f'http://testserver/api/skus/?filter_type={filter_type}&page=2')
+
+    @override_settings(ALLOWED_HOSTS=['first.example.com', 'second.example.com'])
+    def test_cached_first_page_links_follow_the_request(self):
+        self.client.force_login(self.users['merchops1'])
+        # The first request fills the cache with its own host and query string.
+        first = self.embedded('/?search=ignored', 'initial-skus', HTTP_HOST='first.example.com')
+        self.assertEqual(first['next'], 'http://first.example.com/api/skus/?page=2')
+        second = self.embedded('/', 'initial-skus', HTTP_HOST='second.example.com')
+        self.assertEqual(second['next'], 'http://second.example.com/api/skus/?page=2')
+
+
+class CatalogSnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = seed_dataset(sku_count=20, notes_per_sku=0, days=1)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.addCleanup(setattr, snapshot, '_loaded', None)
+        settings_override = override_settings(SKU_SNAPSHOT_DIR=Path(directory) / 'catalog_snapshot')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        snapshot.build_snapshot()
+        with override_settings(SKU_SNAPSHOT_ENABLED=True):
+            self.assertIsNotNone(snapshot.get_snapshot())
+        self.client.force_login(self.users['merchops1'])
+
+    def list_skus(self, params, enabled):
+        with override_settings(SKU_SNAPSHOT_ENABLED=enabled):
+            return self.client.get('/api/skus/', dict(params, page_size=100)).json()
+
+    def test_snapshot_matches_database(self):
+        for params in (
+            {},
+            {'search': 'product 1'},
+            {'search': '"product 1"'},
+            {'search': 'product,2'},
+            {'filter_type': 'high_return_rate'},
+            {'filter_type': 'low_content_score', 'ordering': '-sales'},
+            {'ordering': '-return_percentage,name'},
+            {'search': '"product 1"', 'ordering': 'content_score,-name'},
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.list_skus(params, enabled=True), self.list_skus(params, enabled=False))
+
+    def test_patch_updates_snapshot_in_place(self):
+        sku = SKU.objects.get(sku_id='SKU001')
+        sku.sales = 99999
+        with override_settings(SKU_SNAPSHOT_ENABLED=True):
+            snapshot.patch_sku(sku)
+            self.assertIsNotNone(snapshot.get_snapshot(rebuild=False))
+        self.assertEqual(self.list_skus({'ordering': '-sales'}, enabled=True)['results'][0]['sku_id'], 'SKU001')
+
+    def test_patch_during_build_marks_snapshot_stale(self):
+        sku = SKU.objects.get(sku_id='SKU001')
+        with override_settings(SKU_SNAPSHOT_ENABLED=True):
+            with snapshot._build_lock():
+                # A build holding the lock may already have read the old rows.
+                snapshot.patch_sku(sku)
+            self.assertIsNone(snapshot.get_snapshot(rebuild=False))
+
+    def test_stale_snapshot_queues_rebuild(self):
+        cache.clear()
+        snapshot.mark_stale()
+        SKU.objects.filter(sku_id='SKU001').update(sales=99999)
+        for _ in range(2):
+            response = self.list_skus({'ordering': '-sales'}, enabled=True)
+            # Served from the database, not rebuilt inline.
+            self.assertEqual(response['results'][0]['sales'], 99999)
+        self.assertEqual(Job.objects.filter(name='build_catalog_snapshot').count(), 1)
+
+        jobs.run_job(jobs.claim_next('test'))
+        with override_settings(SKU_SNAPSHOT_ENABLED=True):
+            self.assertIsNotNone(snapshot.get_snapshot(rebuild=False))
+
+    def test_quoted_phrase_matches_phrase(self):
+        response = self.list_skus({'search': '"product 1"'}, enabled=True)
+        self.assertEqual(response['count'], 11)
+
+
+@override_settings(SKU_ADMIN_LARGE_TABLES=True)
+class AdminRangeFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(sku_count=20, notes_per_sku=0, days=1)
+        cls.admin = User.objects.create_superuser('admin', password='password123')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_range_filter(self):
+        response = self.client.get('/admin/skus/sku/', {'sales_range': '100:250'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {sku.sku_id for sku in response.context['cl'].result_list},
+            set(SKU.objects.filter(sales__gte=100, sales__lt=250).values_list('sku_id', flat=True)),
+        )
+
+    def test_invalid_range_is_ignored(self):
+        for value in ('abc:', ':abc', '1:2:3', 'garbage'):
+            with self.subTest(value=value):
+                response = self.client.get('/admin/skus/sku/', {'sales_range': value})
+                self.assertEqual(response.status_code, 200)
+
+
+class SharedSingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        lock_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, lock_dir)
+        settings_override = override_settings(
+            SKU_SINGLEFLIGHT_SHARED=True, SKU_SINGLEFLIGHT_LOCK_DIR=Path(lock_dir), SKU_SINGLEFLIGHT_LOCK_TIMEOUT=2
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_waits_for_the_worker_holding_the_lock(self):
+        with singleflight._shared_lock('key'):
+            # Another worker finishes its computation while this one waits.
+            threading.Timer(0.2, lambda: cache.set('key', {'value': 'shared', 'fresh_until': time.time() + 60})).start()
+            self.assertEqual(singleflight.get_or_compute('key', lambda: self.fail('recomputed'), 60), 'shared')
+
+    @override_settings(SKU_SINGLEFLIGHT_LOCK_TIMEOUT=0.1)
+    def test_computes_after_waiting_too_long(self):
+        with singleflight._shared_lock('key'):
+            self.assertEqual(singleflight.get_or_compute('key', lambda: 'value', 60), 'value')
+
+    def test_stale_value_is_served_while_another_worker_refreshes(self):
+        cache.set('key', {'value': 'stale', 'fresh_until': time.time() - 1}, 60)
+        with singleflight._shared_lock('key'):
+            self.assertEqual(singleflight.get_or_compute('key', lambda: self.fail('recomputed'), 60), 'stale')
+
+    def test_lock_is_released_after_computing(self):
+        self.assertEqual(singleflight.get_or_compute('key', lambda: 'value', 60), 'value')
+        with singleflight._shared_lock('key') as locked:
+            self.assertTrue(locked)
+
+
+class CacheVersionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_version_never_revives_old_entries(self):
+        key = caching.versioned_key('catalog', 'page')
+        cache.set(key, 'old page')
+        cache.delete('skus:version:catalog')  # evicted
+        self.assertIsNone(cache.get(caching.versioned_key('catalog', 'page')))
+
+        caching.bump_version('catalog')
+        self.assertNotEqual(caching.versioned_key('catalog', 'page'), key)
+
+
+class WarmUpTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset(sku_count=5, notes_per_sku=0, days=1)
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(ALLOWED_HOSTS=['merch.example.com'])
+    def test_prefills_caches_for_allowed_host(self):
+        report = {name: ok for name, _, ok in warmup.warm_up()}
+        self.assertTrue(all(report.values()), report)
+
+    def test_prefills_attention_pages(self):
+        warmup.warm_up()
+        request = warmup._internal_request()
+        with self.assertNumQueries(0):
+            for filter_type in (None, *payloads.ATTENTION_FILTERS):
+                payloads.sku_list_first_page(request, filter_type)
+
+    def test_gunicorn_master_closes_its_connections(self):
+        for worker_pid, closed in (('', True), (str(os.getpid()), False)):
+            with self.subTest(worker_pid=worker_pid), \
+                    mock.patch.dict(sys.modules, {'gunicorn.arbiter': mock.Mock()}), \
+                    mock.patch.dict(os.environ, {warmup.GUNICORN_WORKER_ENV: worker_pid}), \
+                    mock.patch.object(warmup.connections, 'close_all') as close_all:
+                warmup.warm_up()
+                self.assertEqual(close_all.called, closed)
+
+    def test_failed_step_does_not_skip_the_others(self):
+        with mock.patch.object(warmup, '_prefill_sku_list', side_effect=DisallowedHost), self.assertLogs('skus.warmup'):
+            report = {name: ok for name, _, ok in warmup.warm_up()}
+        self.assertFalse(report['sku_list_cache'])
+        self.assertTrue(report['leaderboards_cache'])
+        self.assertIsNotNone(cache.get(leaderboards._cache_key('sales')))
+
+
+def failing_job(context):
+    raise RuntimeError('boom')
+
+
+@override_settings(SKU_JOBS_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        registry = mock.patch.dict(jobs._registry, {'failing_job': jobs.RegisteredJob(failing_job, 2, False)})
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def test_claims_by_priority_then_age(self):
+        low = jobs.submit('recompute_sku_sales', priority=0)
+        high = jobs.submit('recompute_sku_sales', priority=5)
+        older_high = jobs.submit('recompute_sku_sales', priority=5)
+        Job.objects.filter(pk=older_high.pk).update(run_after=timezone.now() - datetime.timedelta(minutes=1))
+        later = jobs.submit('recompute_sku_sales', priority=9)
+        Job.objects.filter(pk=later.pk).update(run_after=timezone.now() + datetime.timedelta(minutes=1))
+
+        claimed = [jobs.claim_next('test') for _ in range(4)]
+        self.assertEqual(claimed, [older_high.pk, high.pk, low.pk, None])
+        self.assertEqual(Job.objects.get(pk=low.pk).attempts, 1)
+
+    def test_failed_job_is_retried_with_back_off_until_max_attempts(self):
+        job = jobs.submit('failing_job')
+
+        with self.assertLogs('skus.jobs'):
+            jobs.run_job(jobs.claim_next('test'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('boom', job.error)
+        delay = (job.run_after - timezone.now()).total_seconds()
+        self.assertTrue(8 < delay <= 10, delay)
+        self.assertIsNone(jobs.claim_next('test'))  # Not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('skus.jobs'):
+            jobs.run_job(jobs.claim_next('test'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_successful_job_records_result(self):
+        seed_dataset(sku_count=3, notes_per_sku=0, days=2)
+        job = jobs.submit('recompute_sku_sales')
+        jobs.run_job(jobs.claim_next('test'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.result['skus'], 3)
+
+    def test_unclaim_does_not_count_an_attempt(self):
+        job = jobs.submit('recompute_sku_sales')
+        jobs.unclaim(jobs.claim_next('test'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.STATUS_QUEUED, 0))
+
+
+class SingleFlightTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_calls_share_one_computation(self):
+        group = singleflight.SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(group.do('key', compute))) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Wait until the other callers are blocked on the leader's call.
+        waiters = group._calls['key'].done._cond._waiters
+        deadline = time.monotonic() + 5
+        while len(waiters) < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(waiters), 4)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 5)
+
+    def test_errors_are_shared_and_not_cached(self):
+        group = singleflight.SingleFlight()
+        with self.assertRaises(RuntimeError):
+            group.do('key', lambda: failing_job(None))
+        self.assertFalse(group.in_flight('key'))
+        self.assertEqual(group.do('key', lambda: 'value'), 'value')
+
+    def test_stale_value_is_served_while_refreshing(self):
+        cache.set('key', {'value': 'stale', 'fresh_until': time.time() - 1}, 60)
+        started, release = threading.Event(), threading.Event()
+
+        def refresh():
+            started.set()
+            release.wait(5)
+            return 'fresh'
+
+        refresher = threading.Thread(target=lambda: singleflight.get_or_compute('key', refresh, 60))
+        refresher.start()
+        started.wait(5)
+        # Another caller neither waits nor computes while the refresh runs.
+        self.assertEqual(singleflight.get_or_compute('key', lambda: self.fail('recomputed'), 60), 'stale')
+        release.set()
+        refresher.join(5)
+        self.assertEqual(singleflight.get_or_compute('key', lambda: self.fail('recomputed'), 60), 'fresh')
+
+
+@override_settings(SKU_LEADERBOARD_SIZE=2)
+class LeaderboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Sales are 10, 20, ... 100, so the board holds SKU010 to SKU007.
+        seed_dataset(sku_count=10, notes_per_sku=0, days=3)
+
+    def setUp(self):
+        cache.clear()
+
+    def top_sku_ids(self, board):
+        return [row['sku_id'] for row in leaderboards.top(board)]
+
+    def set_sales(self, sku_id, sales):
+        sku = SKU.objects.get(sku_id=sku_id)
+        sku.sales = sales
+        with self.captureOnCommitCallbacks(execute=True):
+            sku.save()
+
+    def test_boards_match_database(self):
+        for board, ordering in (('sales', '-sales'), ('return_percentage', '-return_percentage'), ('content_score', 'content_score')):
+            with self.subTest(board=board):
+                expected = list(SKU.objects.order_by(ordering, 'pk').values_list('sku_id', flat=True)[:2])
+                self.assertEqual(self.top_sku_ids(board), expected)
+
+    def test_update_reranks_without_queries(self):
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU010', 'SKU009'])
+        sku = SKU.objects.get(sku_id='SKU001')
+        sku.sales = 1000
+        with self.assertNumQueries(0):
+            leaderboards.update_sku(sku)
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU001', 'SKU010'])
+
+        self.set_sales('SKU001', 5)
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU010', 'SKU009'])
+
+    def test_updates_wait_for_the_board_lock(self):
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU010', 'SKU009'])
+        sku = SKU.objects.get(sku_id='SKU001')
+        sku.sales = 1000
+        updater = threading.Thread(target=leaderboards.update_sku, args=(sku,))
+        # Another process is updating the board.
+        with leaderboards._board_lock('sales'):
+            updater.start()
+            updater.join(0.2)
+            self.assertTrue(updater.is_alive())
+            self.assertEqual(self.top_sku_ids('sales'), ['SKU010', 'SKU009'])
+        updater.join(5)
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU001', 'SKU010'])
+
+    def test_partial_board_is_rebuilt_once_below_k(self):
+        self.top_sku_ids('sales')
+        key = leaderboards._cache_key('sales')
+
+        self.set_sales('SKU010', 0)
+        self.set_sales('SKU009', 0)
+        # Two of four entries left, still enough to answer top K.
+        self.assertEqual([entry[2]['sku_id'] for entry in cache.get(key)['entries']], ['SKU008', 'SKU007'])
+
+        self.set_sales('SKU008', 0)
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(self.top_sku_ids('sales'), ['SKU007', 'SKU006'])
+
+    def test_window_board_follows_metric_changes(self):
+        self.assertEqual(self.top_sku_ids('sales_7d'), ['SKU001', 'SKU002'])
+        metric = SKUDailyMetric.objects.filter(sku__sku_id='SKU005').first()
+        metric.sales_units = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            metric.save()
+        self.assertEqual(self.top_sku_ids('sales_7d'), ['SKU005', 'SKU001'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            SKUDailyMetric.objects.filter(sku__sku_id='SKU005').delete()
+        self.assertEqual(self.top_sku_ids('sales_7d'), ['SKU001', 'SKU002'])
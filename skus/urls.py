@@ -1,13 +1,18 @@
 from django.urls import path
-from .views import SKUListAPIView, SKUDetailAPIView, NoteCreateAPIView, NoteRetrieveUpdateAPIView,\
-    SKUDashboardView, SKUDetailView
+from .views import SKUListAPIView, SKUFacetsAPIView, SKUDetailAPIView, LeaderboardAPIView, NoteCreateAPIView, NoteRetrieveUpdateAPIView,\
+    NoteSearchAPIView, JobListCreateAPIView, JobDetailAPIView, SKUDashboardView, SKUDetailView
 
 urlpatterns = [
     # API URLs
     path('api/skus/', SKUListAPIView.as_view(), name='api_sku_list'),
+    path('api/skus/facets/', SKUFacetsAPIView.as_view(), name='api_sku_facets'),
     path('api/skus/<str:sku_id>/', SKUDetailAPIView.as_view(), name='api_sku_detail'),
     path('api/skus/<str:sku_id>/notes/', NoteCreateAPIView.as_view(), name='api_note_create'),
+    path('api/leaderboards/<str:board>/', LeaderboardAPIView.as_view(), name='api_leaderboard'),
+    path('api/notes/search/', NoteSearchAPIView.as_view(), name='api_note_search'),
     path('api/notes/<str:pk>/', NoteRetrieveUpdateAPIView.as_view(), name='api_note_update'),
+    path('api/jobs/', JobListCreateAPIView.as_view(), name='api_job_list'),
+    path('api/jobs/<int:pk>/', JobDetailAPIView.as_view(), name='api_job_detail'),
     
     path('', SKUDashboardView.as_view(), name='sku_list'),
     path('skus/<str:sku_id>/', SKUDetailView.as_view(), name='sku_detail'),
@@ -1,4 +1,5 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import Http404
 from django.contrib.auth.forms import UserCreationForm
 from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView
@@ -6,13 +7,22 @@ from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError, NotFound
+from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.authentication import TokenAuthentication, SessionAuthentication
 from rest_framework import filters
+from rest_framework.settings import api_settings
 import json
-from .serializers import SKUListSerializer, NoteSerializer, SKUDetailsSerializer
-from .models import SKU, Note
+from .serializers import SKUListSerializer, NoteSerializer, SKUDetailsSerializer, JobSerializer,\
+    NoteSearchResultSerializer
+from .models import SKU, Note, Job
+from .facets import FACET_FIELDS, catalog_facets, compute_facets
+from .snapshot import get_snapshot
+from .payloads import ATTENTION_FILTERS, sku_detail_payload, sku_list_first_page
+from .roles import user_group_names
+from .search import search_notes, visible_notes
+from . import jobs, leaderboards
 
 
 class SignUpView(CreateView):
@@ -27,24 +37,13 @@ class StandardResultsSetPagination(PageNumberPagination):
     max_page_size = 25
 
 
-class SKUListAPIView(generics.ListAPIView):
+class SKUFilterMixin:
     """
-    API View to list all SKUs with pagination, search, and filtering.
-    GET /api/skus/
-    - Pagination: ?page=1&page_size=10
-    - Search: ?search=<query> (searches by SKU name)
-    - Filter by high return rate: ?high_return_rate=true (e.g., > 5%)
-    - Filter by low content score: ?low_content_score=true (e.g., < 6.0)
+    Shared search and `filter_type` handling for views that operate
+    on a filtered set of SKUs.
     """
-    serializer_class = SKUListSerializer
-    permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
-
     search_fields = ['name']
-    ordering_fields = ['name', 'sales', 'return_percentage', 'content_score']
-    
+
     def get_queryset(self):
         """
         Optionally restricts the returned SKUs by applying custom filters
@@ -63,6 +62,123 @@ class SKUListAPIView(generics.ListAPIView):
             
         return queryset
 
+
+class SKUListAPIView(SKUFilterMixin, generics.ListAPIView):
+    """
+    API View to list all SKUs with pagination, search, and filtering.
+    GET /api/skus/
+    - Pagination: ?page=1&page_size=10
+    - Search: ?search=<query> (searches by SKU name)
+    - Filter by high return rate: ?high_return_rate=true (e.g., > 5%)
+    - Filter by low content score: ?low_content_score=true (e.g., < 6.0)
+    """
+    serializer_class = SKUListSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 6 # Includes queueing a rebuild once the snapshot goes stale
+
+    ordering_fields = ['name', 'sales', 'return_percentage', 'content_score']
+
+    def is_cached_page(self, request):
+        """
+        Whether the request asks for the first page of the unfiltered list or
+        of an attention filter, which are served from the shared cache.
+        """
+        params = request.query_params
+        if set(params) - {'page', 'page_size', 'filter_type'}:
+            return False
+        page_size = str(self.pagination_class.page_size)
+        return (
+            params.get('page', '1') == '1'
+            and params.get('page_size', page_size) == page_size
+            and params.get('filter_type') in (None, *ATTENTION_FILTERS)
+        )
+
+    def list(self, request, *args, **kwargs):
+        if self.is_cached_page(request):
+            return Response(sku_list_first_page(request._request, request.query_params.get('filter_type')))
+        return self.list_uncached(request, *args, **kwargs)
+
+    def list_uncached(self, request, *args, **kwargs):
+        """
+        Answers from the in-memory catalog snapshot when it is enabled and
+        fresh, otherwise falls back to the database.
+        """
+        catalog = get_snapshot()
+        if catalog is None:
+            return super().list(request, *args, **kwargs)
+
+        positions = catalog.query(
+            search_terms=filters.SearchFilter().get_search_terms(request),
+            filter_type=request.query_params.get('filter_type'),
+            ordering=request.query_params.get(api_settings.ORDERING_PARAM),
+        )
+        page = self.paginate_queryset(catalog.rows(positions))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class SKUFacetsAPIView(SKUFilterMixin, generics.GenericAPIView):
+    """
+    API View returning bucketed histograms of SKU attributes.
+    GET /api/skus/facets/
+    - Facets: ?facets=return_percentage,content_score,sales (defaults to all when omitted)
+    - Accepts the same `search` and `filter_type` parameters as the SKU list.
+    Results for unfiltered queries are cached until a SKU changes.
+    """
+    permission_classes = [IsAuthenticated]
+    filter_backends = [filters.SearchFilter]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 3
+
+    def get(self, request, *args, **kwargs):
+        requested = request.query_params.get('facets')
+        if requested is None:
+            fields = list(FACET_FIELDS)
+        else:
+            fields = [field.strip() for field in requested.split(',') if field.strip()]
+            if not fields:
+                raise ValidationError({'facets': 'Name at least one facet, or omit the parameter for all of them.'})
+
+        invalid = [field for field in fields if field not in FACET_FIELDS]
+        if invalid:
+            raise ValidationError({'facets': f"Unsupported facet(s): {', '.join(invalid)}"})
+
+        is_filtered = bool(request.query_params.get('search') or request.query_params.get('filter_type'))
+        if is_filtered:
+            return Response(compute_facets(self.filter_queryset(self.get_queryset()), fields))
+
+        return Response(catalog_facets(fields))
+
+class LeaderboardAPIView(generics.GenericAPIView):
+    """
+    API View returning the top SKUs of an incrementally maintained leaderboard.
+    GET /api/leaderboards/<board>/
+    - Boards: sales, return_percentage (worst first), content_score (lowest first),
+      sales_7d, sales_30d, returns_7d, returns_30d (rolling daily metric totals)
+    - Limit: ?limit=10 (at most SKU_LEADERBOARD_SIZE)
+    """
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 4
+
+    def get(self, request, *args, **kwargs):
+        board = self.kwargs['board']
+        if board not in leaderboards.BOARDS:
+            raise NotFound(f"Unknown leaderboard. Choose one of: {', '.join(leaderboards.BOARDS)}")
+
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        if limit < 1:
+            raise ValidationError({'limit': 'Ensure this value is greater than or equal to 1.'})
+
+        return Response({'board': board, 'results': leaderboards.top(board, limit)})
+
+
 class SKUDetailAPIView(generics.RetrieveAPIView):
     """
     API View to retrieve details of a single SKU.
@@ -73,6 +189,7 @@ class SKUDetailAPIView(generics.RetrieveAPIView):
     lookup_field = 'sku_id' # Use sku_id from the URL to lookup the SKU
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 6
     
     def get_serializer_context(self):
         """
@@ -81,6 +198,13 @@ class SKUDetailAPIView(generics.RetrieveAPIView):
         """
         return {'request': self.request}
 
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Serves the role-specific payload shared with the server-rendered
+        detail page.
+        """
+        return Response(sku_detail_payload(request, self.kwargs[self.lookup_field]))
+
 
 class NoteCreateAPIView(generics.CreateAPIView):
     """
@@ -91,6 +215,7 @@ class NoteCreateAPIView(generics.CreateAPIView):
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 6
 
     def perform_create(self, serializer):
         """
@@ -99,7 +224,7 @@ class NoteCreateAPIView(generics.CreateAPIView):
         Also adds a permission check for the 'brand_user' group.
         """
         # Check if the authenticated user is in the 'brand_user' group
-        if not self.request.user.groups.filter(name='brand_user').exists():
+        if 'brand_user' not in user_group_names(self.request.user):
             raise PermissionDenied("You do not have permission to add notes.")
 
         sku_id = self.kwargs.get('sku_id')
@@ -120,6 +245,7 @@ class NoteRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
     authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 6
 
     def get_queryset(self):
         """
@@ -127,8 +253,8 @@ class NoteRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         and are in the 'brand_user' group.
         """
         user = self.request.user
-        if user.is_authenticated and user.groups.filter(name='brand_user').exists():
-            return self.queryset.filter(created_by=user)
+        if user.is_authenticated and 'brand_user' in user_group_names(user):
+            return self.queryset.filter(created_by=user).select_related('sku', 'created_by')
         return self.queryset.none() # Return empty queryset if not authorized
 
     def perform_update(self, serializer):
@@ -140,11 +266,94 @@ class NoteRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         serializer.save()
 
 
+class NoteSearchAPIView(generics.ListAPIView):
+    """
+    API View for ranked full-text search over notes.
+    GET /api/notes/search/?q=<query>
+    - Optional: ?sku_id=<sku_id> to restrict to one SKU
+    'merch_ops' users search all notes, 'brand_user' users only their own.
+    """
+    serializer_class = NoteSearchResultSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 6 # Includes looking up the SQLite FTS table on a process's first search without warm-up
+
+    def get_queryset(self):
+        query = self.request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This query parameter is required.'})
+
+        queryset = visible_notes(self.request.user).select_related('sku', 'created_by')
+        sku_id = self.request.query_params.get('sku_id')
+        if sku_id:
+            queryset = queryset.filter(sku__sku_id=sku_id)
+        return search_notes(queryset, query)
+
+
+class JobListCreateAPIView(generics.ListCreateAPIView):
+    """
+    API View to submit background jobs and list submitted jobs.
+    GET /api/jobs/
+    POST /api/jobs/ {"name": "recompute_sku_sales", "params": {}, "priority": 0}
+    Only staff and users in the 'merch_ops' group can submit jobs, and
+    only staff can submit jobs registered as `staff_only`.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 4
+
+    def get_queryset(self):
+        """
+        Staff can see every job, other users only the jobs they submitted.
+        """
+        user = self.request.user
+        if user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=user)
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        if not (user.is_staff or 'merch_ops' in user_group_names(user)):
+            raise PermissionDenied("You do not have permission to submit jobs.")
+        if jobs.get_registered(serializer.validated_data['name']).staff_only and not user.is_staff:
+            raise PermissionDenied("Only staff can submit this job.")
+        serializer.save(created_by=user)
+
+
+class JobDetailAPIView(generics.RetrieveAPIView):
+    """
+    API View to poll the status and progress of a background job.
+    GET /api/jobs/<int:pk>/
+    """
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    query_budget = 3
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_staff:
+            return Job.objects.all()
+        return Job.objects.filter(created_by=user)
+
+
 class SKUDashboardView(TemplateView):
     """
     Dashboard view to list all SKUs.
+    Embeds the first page of SKUs for authenticated users so the
+    dashboard renders without an extra API round trip.
     """
     template_name = 'home.html'
+    query_budget = 4
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.user.is_authenticated:
+            context["initial_skus"] = sku_list_first_page(self.request)
+        return context
 
 
 class SKUDetailView(LoginRequiredMixin, TemplateView):
@@ -152,11 +361,18 @@ class SKUDetailView(LoginRequiredMixin, TemplateView):
     Detail view for a specific SKU.
     """
     template_name = 'sku_detail.html'
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["skuId"] = self.kwargs.get('sku_id')
-        context["can_add_note"] = json.dumps(self.request.user.groups.filter(name='brand_user').exists())
-        context["is_merch_ops"] = json.dumps(self.request.user.groups.filter(name='merch_ops').exists())
+        group_names = user_group_names(self.request.user)
+        context["can_add_note"] = json.dumps('brand_user' in group_names)
+        context["is_merch_ops"] = json.dumps('merch_ops' in group_names)
+        try:
+            context["initial_sku"] = sku_detail_payload(self.request, context["skuId"])
+        except Http404:
+            # Let the page report the missing SKU like any other load error.
+            context["initial_sku"] = None
         return context
 
@@ -0,0 +1,180 @@
+"""
+Warm-up for freshly started workers.
+
+Runs the work the first requests of a cold worker would otherwise pay for:
+URL resolver population, serializer field construction, database
+connections and the hottest caches. Each step is timed for the startup
+report and runs on its own, so one failing cache does not skip the rest.
+
+When gunicorn preloads the app (`--preload` or `preload_app = True`), the
+warm-up runs once in the master process and workers inherit the populated
+resolvers when they fork. Database connections must not be shared across
+a fork, so the master closes them again and the `post_fork` hook in
+`gunicorn.conf.py` opens fresh ones in every worker.
+"""
+import logging
+import os
+import sys
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest
+from django.urls import get_resolver, resolve
+
+logger = logging.getLogger(__name__)
+
+
+# Set by the `post_fork` hook in gunicorn.conf.py, which cannot import Django yet
+GUNICORN_WORKER_ENV = 'SKU_GUNICORN_WORKER_PID'
+
+
+def in_gunicorn_master():
+    """
+    Whether the app is being loaded by a gunicorn master, i.e. preloaded
+    before the workers fork. Workers are marked by the `post_fork` hook,
+    any other gunicorn process is treated as the master.
+    """
+    return 'gunicorn.arbiter' in sys.modules and os.environ.get(GUNICORN_WORKER_ENV) != str(os.getpid())
+
+
+def _populate_url_resolvers():
+    resolver = get_resolver()
+    # Accessing the reverse lookup table populates the resolver
+    resolver.reverse_dict
+    for path in ('/', '/api/skus/', '/api/skus/facets/', '/api/skus/SKU001/', '/api/notes/search/'):
+        resolve(path)
+
+
+def _build_serializers():
+    from . import serializers
+
+    for serializer_class in (
+        serializers.SKUListSerializer,
+        serializers.SKUDetailsSerializer,
+        serializers.NoteSerializer,
+        serializers.NoteSearchResultSerializer,
+        serializers.SKUDailyMetricSerializer,
+        serializers.JobSerializer,
+    ):
+        # Accessing the fields builds them from the model
+        serializer_class().fields
+
+
+def _open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def _detect_search_backend():
+    from .search import detect_full_text_search
+
+    detect_full_text_search()
+
+
+def _internal_request():
+    """
+    A GET request for rendering cached pages outside of a real request,
+    addressed to a host from ALLOWED_HOSTS so absolute URLs can be built.
+    """
+    hosts = [host for host in settings.ALLOWED_HOSTS if not host.startswith(('.', '*'))]
+    request = HttpRequest()
+    request.method = 'GET'
+    request.META = {'SERVER_NAME': hosts[0] if hosts else 'localhost', 'SERVER_PORT': '80'}
+    return request
+
+
+def _prefill_sku_list():
+    from .payloads import ATTENTION_FILTERS, sku_list_first_page
+
+    request = _internal_request()
+    for filter_type in (None, *ATTENTION_FILTERS):
+        sku_list_first_page(request, filter_type)
+
+
+def _prefill_facets():
+    from .facets import catalog_facets
+
+    catalog_facets()
+
+
+def _prefill_leaderboards():
+    from . import leaderboards
+
+    for board in leaderboards.BOARDS:
+        leaderboards.top(board)
+
+
+def _load_snapshot():
+    from . import snapshot
+
+    snapshot.get_snapshot()
+
+
+def warm_up(boot_started=None, connect=None):
+    """
+    Warms the current process and returns the startup report as a list of
+    `(step, seconds, ok)` tuples. Steps run independently, a failed step is
+    logged and reported without skipping the others. `boot_started` is a
+    `time.perf_counter()` value taken before Django was set up, used to
+    report setup time.
+    `connect` keeps database connections open (default: unless running in
+    the gunicorn master).
+    """
+    if connect is None:
+        connect = not in_gunicorn_master()
+
+    report = []
+    if boot_started is not None:
+        report.append(('django_setup', time.perf_counter() - boot_started, True))
+
+    steps = [
+        ('url_resolvers', _populate_url_resolvers),
+        ('serializers', _build_serializers),
+        ('database_connections', _open_connections),
+        ('search_backend', _detect_search_backend),
+        ('sku_list_cache', _prefill_sku_list),
+        ('facets_cache', _prefill_facets),
+        ('leaderboards_cache', _prefill_leaderboards),
+        ('catalog_snapshot', _load_snapshot),
+    ]
+    for name, step in steps:
+        started = time.perf_counter()
+        ok = True
+        try:
+            step()
+        except Exception:
+            # A failed warm-up step only costs latency, never the worker.
+            logger.exception("Warm-up step %s failed", name)
+            ok = False
+        report.append((name, time.perf_counter() - started, ok))
+
+    if not connect:
+        connections.close_all()
+
+    logger.info(
+        "Worker %s warmed up in %.1f ms (%s)",
+        os.getpid(),
+        sum(seconds for _, seconds, _ in report) * 1000,
+        ', '.join(f"{name}={seconds * 1000:.1f}ms{'' if ok else ' (failed)'}" for name, seconds, ok in report),
+    )
+    return report
+
+
+def warm_up_on_boot(boot_started=None):
+    """
+    Runs the warm-up from the WSGI/ASGI entry points when `SKU_WARM_UP_ON_BOOT` is set.
+    """
+    if getattr(settings, "SKU_WARM_UP_ON_BOOT", False):
+        warm_up(boot_started=boot_started)
+
+
+def warm_up_forked_worker():
+    """
+    Opens the database connections of a worker forked from a gunicorn
+    master that preloaded (and warmed up) the app.
+    """
+    if getattr(settings, "SKU_WARM_UP_ON_BOOT", False):
+        started = time.perf_counter()
+        _open_connections()
+        logger.info("Worker %s opened database connections in %.1f ms", os.getpid(), (time.perf_counter() - started) * 1000)
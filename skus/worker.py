@@ -0,0 +1,16 @@
+"""
+Entry points for jobs executed in spawned worker processes.
+
+This module must not import models at import time: spawned processes
+unpickle references to these functions before Django is set up.
+"""
+import django
+
+
+def init_process():
+    django.setup()
+
+
+def run_job(job_id):
+    from .jobs import run_job as run
+    run(job_id)